@@ -0,0 +1,272 @@
+"""
+This file holds compiled versions of the election kernels that the batched engines spend their time in: the IRV and
+primary/general elections of general_distributions on a shared prefix sum, and the IRV of standard_election on
+discrete voters. Each kernel runs one trial per row of its candidate matrix, with the rows spread over threads.
+
+Numba is optional. When it is installed the kernels are compiled with njit (and cached on disk, so only the first run
+pays for compilation); without it the engines keep using their NumPy implementations. Engines pick the kernels with
+backend='numba', which resolve_backend turns into the backend that will actually run, after checking once per process
+that the compiled kernels agree with the NumPy ones. The pools of parallel_runs and sweep_scheduler start their workers
+with pool_context and set them up with init_pool_worker, so the kernels run on one thread per worker and are not
+checked again in each of them.
+"""
+
+import multiprocessing
+
+import numpy as np
+
+try:
+    import numba
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    # Without Numba the kernels below stay plain Python functions, which validate_backend can still run
+    def njit(*args, **kwargs):
+        return lambda function: function
+
+    prange = range
+
+BACKENDS = ('numpy', 'numba')
+VALIDATED = False
+
+"""
+This kernel returns one candidate's share of the voters in prefix_sum, between the rounded midpoints to its neighbours
+(the bounds of general_distributions.getVoterProportions). previous is -1 and following is len(row) where there is no
+neighbour on that side, in which case the share starts at 0 or ends at last_bound.
+"""
+@njit(cache=True)
+def prefix_sum_share(prefix_sum, row, previous, i, following, last_bound):
+    left_bound = 0
+    if previous >= 0:
+        left_bound = int(np.rint((row[previous] + row[i]) / 2)) + 1
+    right_bound = last_bound
+    if following < len(row):
+        right_bound = int(np.rint((row[i] + row[following]) / 2))
+    return prefix_sum[right_bound] - prefix_sum[left_bound]
+
+"""
+This kernel returns the plurality winner among columns start to stop - 1 of row, whose voters are prefix_sum up to
+last_bound. Ties go to the leftmost candidate.
+"""
+@njit(cache=True)
+def prefix_sum_plurality_winner(prefix_sum, row, start, stop, last_bound):
+    winner = start
+    most_votes = -np.inf
+    for i in range(start, stop):
+        previous = i - 1 if i > start else -1
+        following = i + 1 if i + 1 < stop else len(row)
+        votes = prefix_sum_share(prefix_sum, row, previous, i, following, last_bound)
+        if votes > most_votes:
+            winner = i
+            most_votes = votes
+    return row[winner]
+
+"""
+This kernel is general_distributions.findCESWinnerValues: a left primary among the left_counts[t] left candidates of
+row t, a right primary among the rest on the voters right of median_loc, and a general election that the left winner
+takes on ties.
+"""
+@njit(cache=True, parallel=True)
+def prefix_sum_ces_winners(prefix_sum, median_loc, candidates, left_counts):
+    num_trials, num_candidates = candidates.shape
+    last_bound = len(prefix_sum) - 1
+    right_prefix_sum = prefix_sum[median_loc + 1:]
+    winners = np.empty(num_trials, dtype=candidates.dtype)
+
+    for trial in prange(num_trials):
+        row = candidates[trial]
+        num_left = left_counts[trial]
+        if num_left > 0:
+            left_winner = prefix_sum_plurality_winner(prefix_sum, row, 0, num_left, median_loc - 1)
+        if num_left < num_candidates:
+            right_winner = median_loc + prefix_sum_plurality_winner(right_prefix_sum, row - median_loc, num_left,
+                                                                    num_candidates, len(right_prefix_sum) - 1)
+
+        if num_left == 0:
+            winners[trial] = right_winner
+        elif num_left == num_candidates:
+            winners[trial] = left_winner
+        else:
+            middle = int(np.rint((left_winner + right_winner) / 2))
+            left_votes = prefix_sum[middle] - prefix_sum[0]
+            right_votes = prefix_sum[last_bound] - prefix_sum[min(middle + 1, last_bound)]
+            winners[trial] = left_winner if left_votes >= right_votes else right_winner
+
+    return winners
+
+"""
+This kernel is general_distributions.findRCVWinnerValues: in every row it eliminates the candidate with the lowest
+share (the leftmost on ties) until one is left, recomputing only the shares of the eliminated candidate's neighbours.
+"""
+@njit(cache=True, parallel=True)
+def prefix_sum_rcv_winners(prefix_sum, candidates):
+    num_trials, num_candidates = candidates.shape
+    last_bound = len(prefix_sum) - 1
+    winners = np.empty(num_trials, dtype=candidates.dtype)
+
+    for trial in prange(num_trials):
+        row = candidates[trial]
+        previous = np.arange(-1, num_candidates - 1)
+        following = np.arange(1, num_candidates + 1)
+        shares = np.empty(num_candidates)
+        for i in range(num_candidates):
+            shares[i] = prefix_sum_share(prefix_sum, row, previous[i], i, following[i], last_bound)
+
+        first = 0
+        for _ in range(num_candidates - 1):
+            lowest = first
+            i = following[first]
+            while i < num_candidates:
+                if shares[i] < shares[lowest]:
+                    lowest = i
+                i = following[i]
+
+            left, right = previous[lowest], following[lowest]
+            if left >= 0:
+                following[left] = right
+            else:
+                first = right
+            if right < num_candidates:
+                previous[right] = left
+            if left >= 0:
+                shares[left] = prefix_sum_share(prefix_sum, row, previous[left], left, following[left], last_bound)
+            if right < num_candidates:
+                shares[right] = prefix_sum_share(prefix_sum, row, previous[right], right, following[right],
+                                                 last_bound)
+
+        winners[trial] = row[first]
+
+    return winners
+
+"""
+This kernel counts the first choices of candidate i of row among the sorted voters, from the midpoints to its
+surviving neighbours previous and following (-1 and len(row) where there is none).
+"""
+@njit(cache=True)
+def first_choice_votes(voters, row, previous, i, following):
+    lower = 0
+    if previous >= 0:
+        lower = np.searchsorted(voters, (row[previous] + row[i]) / 2, side='right')
+    upper = len(voters)
+    if following < len(row):
+        upper = np.searchsorted(voters, (row[i] + row[following]) / 2, side='right')
+    return upper - lower
+
+"""
+This kernel is standard_election.find_rcv_polarization_batch: in every row, the candidate with a majority of first
+choices wins, and otherwise the candidate with the fewest (but some) first choices is eliminated, the leftmost on ties.
+It returns the RCV polarization of every trial.
+"""
+@njit(cache=True, parallel=True)
+def rcv_polarization_batch(voters_sorted, candidates_sorted, median_voters):
+    num_trials, num_candidates = candidates_sorted.shape
+    half_voters = voters_sorted.shape[1] / 2
+    polarization = np.empty(num_trials)
+
+    for trial in prange(num_trials):
+        voters = voters_sorted[trial]
+        row = candidates_sorted[trial]
+        previous = np.arange(-1, num_candidates - 1)
+        following = np.arange(1, num_candidates + 1)
+        tally = np.empty(num_candidates, dtype=np.int64)
+        for i in range(num_candidates):
+            tally[i] = first_choice_votes(voters, row, previous[i], i, following[i])
+
+        while True:
+            top_candidate = 0
+            least_votes = -1
+            for i in range(num_candidates):
+                if tally[i] > tally[top_candidate]:
+                    top_candidate = i
+                if tally[i] > 0 and (least_votes < 0 or tally[i] < tally[least_votes]):
+                    least_votes = i
+            if tally[top_candidate] > half_voters:
+                polarization[trial] = abs(median_voters[trial] - row[top_candidate])
+                break
+
+            tally[least_votes] = 0
+            left, right = previous[least_votes], following[least_votes]
+            if left >= 0:
+                following[left] = right
+            if right < num_candidates:
+                previous[right] = left
+            if left >= 0:
+                tally[left] = first_choice_votes(voters, row, previous[left], left, following[left])
+            if right < num_candidates:
+                tally[right] = first_choice_votes(voters, row, previous[right], right, following[right])
+
+    return polarization
+
+"""
+This function checks the kernels against the NumPy engines they replace on num_trials random elections of each kind,
+including prefix sums with flat stretches where shares tie. It raises a RuntimeError naming any kernel that disagrees.
+"""
+def validate_backend(num_trials=256, seed=0):
+    from general_distributions import findCESWinnerValues, findRCVWinnerValues, sampleCandidateBlock
+    from standard_election import find_rcv_polarization_batch
+
+    rng = np.random.default_rng(seed)
+    mismatches = []
+
+    for steps in (rng.random(20000), rng.integers(0, 3, 20000).astype(float)):
+        prefix_sum = np.append([0], np.cumsum(steps))
+        median_loc = np.searchsorted(prefix_sum, prefix_sum[-1] / 2)
+        for num_candidates in (1, 2, 5, 17):
+            candidates, left_counts = sampleCandidateBlock(prefix_sum, median_loc, num_trials, num_candidates, rng)
+            if not np.array_equal(prefix_sum_ces_winners(prefix_sum, median_loc, candidates, left_counts),
+                                  findCESWinnerValues(prefix_sum, median_loc, candidates, left_counts)):
+                mismatches.append(f'prefix_sum_ces_winners ({num_candidates} candidates)')
+            if not np.array_equal(prefix_sum_rcv_winners(prefix_sum, candidates),
+                                  findRCVWinnerValues(prefix_sum, candidates)):
+                mismatches.append(f'prefix_sum_rcv_winners ({num_candidates} candidates)')
+
+    for num_voters, num_candidates in ((11, 3), (100, 5), (1001, 12)):
+        voters = np.sort(rng.random((num_trials, num_voters)) * 20, axis=1)
+        candidates = np.sort(rng.random((num_trials, num_candidates)) * 20, axis=1)
+        median_voters = np.median(voters, axis=1)
+        if not np.array_equal(rcv_polarization_batch(voters, candidates, median_voters),
+                              find_rcv_polarization_batch(voters, candidates, median_voters)):
+            mismatches.append(f'rcv_polarization_batch ({num_voters} voters, {num_candidates} candidates)')
+
+    if mismatches:
+        raise RuntimeError('The compiled kernels disagree with the NumPy engines: ' + ', '.join(mismatches))
+
+"""
+This function sets up a worker process of a pool. The pool already keeps every CPU busy, so the kernels run on a single
+thread in each worker instead of starting a thread per CPU in every one of them. validated is whether the parent has
+validated the kernels, which then holds in the worker too.
+"""
+def init_pool_worker(validated):
+    global VALIDATED
+    VALIDATED = validated
+    if NUMBA_AVAILABLE:
+        numba.set_num_threads(1)
+
+"""
+This function returns the multiprocessing context a pool should start its workers with. The threads behind the
+parallel kernels do not survive a fork, and forking a process that has started them can hang it, so once the kernels
+have run here (validating them runs them) workers are forked from a clean forkserver process instead. Otherwise it
+returns None, the default context.
+"""
+def pool_context():
+    if VALIDATED and NUMBA_AVAILABLE and 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return None
+
+"""
+This function returns the backend that will run for the requested one: 'numpy', or 'numba' if Numba is installed
+(falling back to 'numpy' otherwise). The first time 'numba' is used in a process its kernels are validated, so callers
+that run the kernels on a pool should resolve the backend before starting it.
+"""
+def resolve_backend(backend):
+    global VALIDATED
+    if backend not in BACKENDS:
+        raise ValueError(f'Unknown backend {backend!r}, expected one of {BACKENDS}')
+    if backend == 'numpy' or not NUMBA_AVAILABLE:
+        return 'numpy'
+    if not VALIDATED:
+        validate_backend()
+        VALIDATED = True
+    return 'numba'
@@ -0,0 +1,76 @@
+"""
+This file runs a percentage estimate in batches of trials until it is precise enough, instead of for a fixed number of
+trials. After every batch it computes a confidence interval on the share of trials where RCV is no worse than CES
+(RCV polarization at or below CES polarization) and on the share where the two are tied, and it stops once both
+intervals are narrower than the requested width, or once the trial cap is reached.
+
+Intervals are Wilson score intervals by default, which stay sensible for shares near 0 or 1, or percentile bootstrap
+intervals (binomial resamples of the observed share). The check is repeated after every batch, so the intervals are a
+stopping rule rather than exact coverage guarantees.
+"""
+
+import math
+from collections import namedtuple
+
+import numpy as np
+from scipy.special import ndtri
+
+INTERVAL_METHODS = ('wilson', 'bootstrap')
+CONFIDENCE_LEVEL = 0.95
+BOOTSTRAP_RESAMPLES = 2000
+
+# Trials run between checks of the intervals, and the default cap on the trials of one estimate
+ADAPTIVE_BATCH_SIZE = 10000
+ADAPTIVE_MAX_TRIALS = 1000000
+
+""" The outcome counts of an adaptive run, the trials it used, whether it converged, and its final intervals. """
+AdaptiveEstimate = namedtuple('AdaptiveEstimate', ['num_above', 'num_equal', 'num_below', 'trials', 'converged',
+                                                   'no_worse_interval', 'tied_interval'])
+
+"""
+This function returns the confidence interval, at the given level, of a share observed as successes out of trials.
+method is 'wilson' or 'bootstrap'; the bootstrap draws its resamples from rng.
+"""
+def confidence_interval(successes, trials, method='wilson', level=CONFIDENCE_LEVEL, rng=None,
+                        resamples=BOOTSTRAP_RESAMPLES):
+    if method not in INTERVAL_METHODS:
+        raise ValueError(f'Unknown interval method {method!r}, expected one of {INTERVAL_METHODS}')
+    if trials == 0:
+        return 0.0, 1.0
+    share = successes / trials
+
+    if method == 'bootstrap':
+        shares = np.random.default_rng(rng).binomial(trials, share, size=resamples) / trials
+        low, high = np.quantile(shares, [(1 - level) / 2, (1 + level) / 2])
+        return float(low), float(high)
+
+    z = ndtri((1 + level) / 2)
+    center = (share + z ** 2 / (2 * trials)) / (1 + z ** 2 / trials)
+    spread = z / (1 + z ** 2 / trials) * math.sqrt(share * (1 - share) / trials + z ** 2 / (4 * trials ** 2))
+    return max(0.0, float(center - spread)), min(1.0, float(center + spread))
+
+"""
+This function runs run_batch until the no-worse and tied intervals are both at most width wide, or until max_trials
+trials have run, and returns an AdaptiveEstimate. run_batch(trials, seed) must run that many new trials, drawing from
+a generator seeded with seed, and return how many had RCV polarization above, equal to, and below CES polarization.
+The batch seeds come from rng (a np.random.Generator or anything np.random.default_rng accepts), so a given rng gives
+the same estimate whatever the interval method.
+"""
+def run_until_precise(run_batch, width, max_trials=ADAPTIVE_MAX_TRIALS, batch_size=ADAPTIVE_BATCH_SIZE,
+                      method='wilson', rng=None):
+    rng = np.random.default_rng(rng)
+    bootstrap_rng = np.random.default_rng(rng.integers(2 ** 63))
+    counts = np.zeros(3, dtype=np.int64)
+    trials = 0
+
+    while True:
+        batch = min(batch_size, max_trials - trials)
+        counts += run_batch(batch, int(rng.integers(2 ** 63)))
+        trials += batch
+
+        num_above, num_equal, num_below = (int(count) for count in counts)
+        no_worse = confidence_interval(num_equal + num_below, trials, method, rng=bootstrap_rng)
+        tied = confidence_interval(num_equal, trials, method, rng=bootstrap_rng)
+        converged = no_worse[1] - no_worse[0] <= width and tied[1] - tied[0] <= width
+        if converged or trials >= max_trials:
+            return AdaptiveEstimate(num_above, num_equal, num_below, trials, converged, no_worse, tied)
@@ -0,0 +1,157 @@
+"""
+This file is the analytic engine for general_distributions. Instead of discretizing a voter distribution on a grid of
+graphSections points and reading vote shares off its prefix sums, candidates are continuous positions in [0, 1] and a
+candidate's vote share is the difference of the exact CDF at the midpoints to its neighbours. An election with C
+candidates costs O(C) CDF evaluations per round, whatever the resolution, and there is no grid to set up.
+
+Like the grid prefix sums, cdf(x) is the (not necessarily normalized) voter mass in [0, x], and total is the mass in
+[0, 1]. Candidates are drawn by inverting the CDF, exactly for the normal and uniform distributions and by bisection for
+splines.
+"""
+
+import numpy as np
+from scipy.interpolate import PPoly
+from scipy.special import ndtr, ndtri
+
+# Bisection halves [0, 1] this many times, placing candidates to within 1e-12
+BISECTION_STEPS = 40
+
+
+class AnalyticDistribution:
+    """ A voter distribution on [0, 1]; subclasses provide cdf(x) and, where they can, an exact ppf(mass). """
+
+    def __init__(self):
+        self.total = float(self.cdf(1.0))
+        self.median = float(self.ppf(self.total / 2))
+
+    # Position at which the voter mass to the left reaches mass, found by bisection on a nondecreasing cdf
+    def ppf(self, mass):
+        mass = np.asarray(mass, dtype=np.float64)
+        lower = np.zeros(mass.shape)
+        upper = np.ones(mass.shape)
+        for _ in range(BISECTION_STEPS):
+            middle = (lower + upper) / 2
+            below = self.cdf(middle) < mass
+            lower = np.where(below, middle, lower)
+            upper = np.where(below, upper, middle)
+        return (lower + upper) / 2
+
+
+class NormalCDF(AnalyticDistribution):
+    """ The normal distribution with the given loc and scale, restricted to [0, 1]. """
+
+    def __init__(self, loc=0.5, scale=0.2):
+        self.loc = loc
+        self.scale = scale
+        self.start = ndtr(-loc / scale)
+        super().__init__()
+
+    # ndtr and ndtri are the standard normal CDF and its inverse, without the overhead of scipy.stats.norm
+    def cdf(self, x):
+        return ndtr((np.asarray(x) - self.loc) / self.scale) - self.start
+
+    def ppf(self, mass):
+        return self.loc + self.scale * ndtri(self.start + np.asarray(mass))
+
+
+class UniformCDF(AnalyticDistribution):
+    """ The uniform distribution on [0, 1]. """
+
+    def cdf(self, x):
+        return np.clip(x, 0, 1)
+
+    def ppf(self, mass):
+        return np.asarray(mass, dtype=np.float64)
+
+
+class SplineCDF(AnalyticDistribution):
+    """
+    The density max(spline, 0) of a scipy UnivariateSpline or BSpline, like the grid engine's prefix sums. It is
+    integrated exactly through the spline's antiderivative on the pieces between the roots of the spline where the
+    spline is positive; the pieces where it dips below zero hold no voters.
+    """
+
+    def __init__(self, spline):
+        self.antiderivative = spline.antiderivative()
+        roots = PPoly.from_spline(spline._eval_args if hasattr(spline, '_eval_args') else spline).roots()
+        self.bounds = np.unique(np.concatenate(([0.0, 1.0], roots[(roots > 0) & (roots < 1)])))
+        self.positive = spline((self.bounds[:-1] + self.bounds[1:]) / 2) > 0
+        boundValues = self.antiderivative(self.bounds)
+        self.startMass = np.concatenate(([0.0], np.cumsum(np.where(self.positive, np.diff(boundValues), 0))))[:-1]
+        # On a positive piece the CDF is the antiderivative shifted by this offset; elsewhere it stays at startMass
+        self.offsets = self.startMass - boundValues[:-1]
+        super().__init__()
+
+    def cdf(self, x):
+        if len(self.positive) == 1 and self.positive[0]:
+            return self.antiderivative(x) + self.offsets[0]
+        piece = np.clip(np.searchsorted(self.bounds, x, side='right') - 1, 0, len(self.positive) - 1)
+        return np.where(self.positive[piece], self.antiderivative(x) + self.offsets[piece], self.startMass[piece])
+
+
+# Vote shares of the sorted candidates among the voters in [lower, upper]
+def getVoterShares(distribution, candidates, lower=0.0, upper=1.0):
+    candidates = np.asarray(candidates, dtype=np.float64)
+    bounds = np.empty(len(candidates) + 1)
+    bounds[0], bounds[-1] = lower, upper
+    bounds[1:-1] = (candidates[:-1] + candidates[1:]) / 2
+    return np.diff(distribution.cdf(bounds))
+
+
+def findSimpleElectionWinnerPosition(distribution, candidates, lower=0.0, upper=1.0):
+    return candidates[np.argmax(getVoterShares(distribution, candidates, lower, upper))]
+
+
+# Left and right primaries among the voters on each side of the median, then a general election between the winners
+def findCESWinnerPosition(distribution, candidates, leftCandidates, rightCandidates):
+    winners = []
+    if leftCandidates > 0:
+        winners.append(findSimpleElectionWinnerPosition(distribution, candidates[:leftCandidates],
+                                                        upper=distribution.median))
+
+    if rightCandidates > 0:
+        winners.append(findSimpleElectionWinnerPosition(distribution, candidates[leftCandidates:],
+                                                        lower=distribution.median))
+
+    if len(winners) == 1:
+        return winners[0]
+
+    shares = getVoterShares(distribution, winners)
+
+    return winners[0] if shares[0] >= shares[1] else winners[1]
+
+
+# Eliminate the candidate with the fewest first choices until one is left
+def findRCVWinnerPosition(distribution, candidates):
+    remaining = list(candidates)
+    while len(remaining) > 1:
+        del remaining[np.argmin(getVoterShares(distribution, remaining))]
+    return remaining[0]
+
+
+# Draw numCandidates sorted candidate positions from the voter distribution, from draws (uniform in [0, 1)) if given
+def sampleCandidates(distribution, numCandidates, rng, draws=None):
+    if draws is None:
+        draws = rng.random(numCandidates)
+    return np.sort(distribution.ppf(draws * distribution.total))
+
+
+# One election on the analytic engine, returning the (CES, RCV) winning positions. With randomizeCandidates the
+# candidates are drawn from the voters, otherwise leftCandidates and rightCandidates are placed uniformly on each side
+# of the median. draws, if given, are the uniform numbers to place the candidates with instead of rng's.
+def runAnalyticElection(distribution, numCandidates, randomizeCandidates, leftCandidates, rightCandidates, rng,
+                        draws=None):
+    if randomizeCandidates:
+        candidates = sampleCandidates(distribution, numCandidates, rng, draws)
+        leftCandidates = int(np.count_nonzero(candidates < distribution.median))
+        rightCandidates = numCandidates - leftCandidates
+    elif draws is not None:
+        median = distribution.median
+        candidates = np.concatenate((np.sort(median * draws[:leftCandidates]),
+                                     np.sort(median + (1 - median) * draws[leftCandidates:])))
+    else:
+        candidates = np.concatenate((np.sort(rng.uniform(0, distribution.median, leftCandidates)),
+                                     np.sort(rng.uniform(distribution.median, 1, rightCandidates))))
+
+    return (findCESWinnerPosition(distribution, candidates, leftCandidates, rightCandidates),
+            findRCVWinnerPosition(distribution, candidates))
@@ -1,5 +1,9 @@
 import matplotlib.pyplot as plt
 import general_distributions as dist
+from result_sinks import StatisticsSink
+from results_store import ResultsStore, RESULTS_PATH
+from shared_arrays import release_array
+from sweep_scheduler import run_sweep
 from scipy.stats import norm
 import numpy as np
 
@@ -16,51 +20,89 @@ BELOW_COLOR = 'green'
 DISPLAY_DISTRIBUTION_MODE = False
 NUM_GRAPH_SECTIONS = 50000
 
+# Seed for the sweep over the graph array and the number of worker processes its cells run on (all CPUs if None)
+SEED = None
+WORKERS = None
+
 def percentage(val, total):
     return round(100 * float(val)/total, 2)
 
+# For polarization arrays that are already in memory; long runs should pass a StatisticsSink to the simulation instead
 def computeStatistics(CESPol, RCVPol):
-    numAbove = 0
-    numEqual = 0
-    numBelow = 0
-    colorArr = []
-
-    for i, pol in enumerate(CESPol):
-        if RCVPol[i] > pol:
-            numAbove += 1
-            colorArr.append(ABOVE_COLOR)
-        elif RCVPol[i] == pol:
-            numEqual += 1
-            colorArr.append(EQUAL_COLOR)
-        else:
-            numBelow += 1
-            colorArr.append(BELOW_COLOR)
-
-    return numAbove, numEqual, numBelow, colorArr
+    statistics = StatisticsSink(sampleSize=0)
+    statistics.append(CESPol, RCVPol)
 
-def partition(CESPol, RCVPol, colorArr):
-    above = [[], []]
-    equal = [[], []]
-    below = [[], []]
-
-    for i in range(min(len(CESPol), NUM_TO_SHOW)):
-        if colorArr[i] == ABOVE_COLOR:
-            above[0].append(CESPol[i])
-            above[1].append(RCVPol[i])
-        elif colorArr[i] == EQUAL_COLOR:
-            equal[0].append(CESPol[i])
-            equal[1].append(RCVPol[i])
-        elif colorArr[i] == BELOW_COLOR:
-            below[0].append(CESPol[i])
-            below[1].append(RCVPol[i])
-
-    return above, equal, below
-
-def showGraphArray():
-    plt.rcParams["figure.figsize"] = (12, 12)
+    CESPol = np.asarray(CESPol)
+    RCVPol = np.asarray(RCVPol)
+    colorArr = np.where(RCVPol > CESPol, ABOVE_COLOR, np.where(RCVPol == CESPol, EQUAL_COLOR, BELOW_COLOR))
+
+    return statistics.numAbove, statistics.numEqual, statistics.numBelow, colorArr
 
+def partition(CESPol, RCVPol, colorArr):
+    shown = slice(0, min(len(CESPol), NUM_TO_SHOW))
+    CESPol = np.asarray(CESPol)[shown]
+    RCVPol = np.asarray(RCVPol)[shown]
+    colorArr = np.asarray(colorArr)[shown]
+
+    return tuple([CESPol[colorArr == color].tolist(), RCVPol[colorArr == color].tolist()]
+                 for color in (ABOVE_COLOR, EQUAL_COLOR, BELOW_COLOR))
+
+# One cell of the graph array, run by the sweep scheduler on the prefix sums published for its (loc, scale): the
+# statistics of trials trials, sampleSize of them kept
+def graphArrayCell(prefixSums, trials, numCandidates, sampleSize, parameters, seedSequence):
+    simulationSeed, sampleSeed = seedSequence.spawn(2)
+    statistics = StatisticsSink(sampleSize=sampleSize, rng=sampleSeed)
+    dist.runGeneralDistributionVoters(trials=trials, numCandidates=numCandidates, sink=statistics, rng=simulationSeed,
+                                      showProgress=False, prefixSum=prefixSums[(parameters['loc'], parameters['scale'])],
+                                      **parameters)
+    return statistics
+
+# Full configuration of a cell of the graph array, which keys its results in the store
+def graphArrayConfiguration(mean, deviation):
+    return {'engine': 'grid', 'distribution': 'normal', 'graphSections': dist.NUM_GRAPH_SECTIONS, 'loc': mean,
+            'scale': deviation, 'numCandidates': NUM_CANDIDATES, 'trials': TRIALS, 'sampleSize': NUM_TO_SHOW,
+            'seed': SEED}
+
+def graphArrayAxes():
     means = [0.5 + (0.1 * i) for i in range(NUM_MEANS)]
     deviations = [0.05 * (2 ** i) for i in range(NUM_DEVIATIONS)]
+    return [('loc', means), ('scale', deviations)]
+
+# Cells already in the results store are not simulated again, and new ones are stored as they finish. The prefix sums
+# of the cells left to run are built once here and shared with the workers (in shareDirectory instead of shared memory
+# if it is given)
+def showGraphArray(workers=WORKERS, storePath=RESULTS_PATH, shareDirectory=None):
+    store = ResultsStore(storePath)
+
+    def storeCell(parameters, statistics):
+        store.put(graphArrayConfiguration(parameters['loc'], parameters['scale']),
+                  (statistics.numAbove, statistics.numEqual, statistics.numBelow, statistics.count), statistics.sample)
+
+    # Every cell is simulated before anything is drawn
+    if not DISPLAY_DISTRIBUTION_MODE:
+        (_, means), (_, deviations) = graphArrayAxes()
+        prefixSums = dist.publishNormalPrefixSums([(mean, deviation) for mean in means for deviation in deviations
+                                                   if store.get(graphArrayConfiguration(mean, deviation)) is None],
+                                                  directory=shareDirectory)
+        try:
+            run_sweep(graphArrayCell, graphArrayAxes(), args=(TRIALS, NUM_CANDIDATES, NUM_TO_SHOW), workers=workers,
+                      seed=SEED, lookup=lambda parameters: store.get(graphArrayConfiguration(parameters['loc'],
+                                                                                             parameters['scale'])),
+                      on_result=storeCell, shared=(prefixSums,))
+        finally:
+            for handle in prefixSums.values():
+                release_array(handle)
+
+    renderGraphArray(store)
+    store.close()
+
+# Draws showGraphArray's figure from the results store alone, without simulating anything
+def renderGraphArray(store=RESULTS_PATH):
+    if not isinstance(store, ResultsStore):
+        store = ResultsStore(store)
+    plt.rcParams["figure.figsize"] = (12, 12)
+
+    (_, means), (_, deviations) = graphArrayAxes()
 
     figure, axis = plt.subplots(NUM_MEANS, NUM_DEVIATIONS)
 
@@ -76,12 +118,14 @@ def showGraphArray():
                                        labelbottom=False, labelleft=False)
                 continue
 
-            CESPol, RCVPol = \
-                dist.runGeneralDistributionVoters(loc=mean, scale=deviation, trials=TRIALS, numCandidates=NUM_CANDIDATES)
+            stored = store.get(graphArrayConfiguration(mean, deviation))
+            if stored is None:
+                raise KeyError(f'No stored results for {graphArrayConfiguration(mean, deviation)}')
+            CESPol, RCVPol = stored.sample[:, 0], stored.sample[:, 1]
 
-            above, on, below, colors = computeStatistics(CESPol, RCVPol)
+            above, on, below, total = stored.numAbove, stored.numEqual, stored.numBelow, stored.count
 
-            aboveList, onList, belowList = partition(CESPol, RCVPol, colors)
+            aboveList, onList, belowList = partition(CESPol, RCVPol, computeStatistics(CESPol, RCVPol)[3])
 
             axis[i, j].set_title(f'μ = {mean}, σ = {deviation}')
 
@@ -89,16 +133,16 @@ def showGraphArray():
                                    left=False, right=False, top=False,
                                    labelbottom=False, labelleft=False)
 
-            axis[i, j].scatter(aboveList[0], aboveList[1], color=ABOVE_COLOR, label=f"{percentage(above, TRIALS)}%")
-            axis[i, j].scatter(onList[0], onList[1], color=EQUAL_COLOR, label=f"{percentage(on, TRIALS)}%")
-            axis[i, j].scatter(belowList[0], belowList[1], color=BELOW_COLOR, label=f"{percentage(below, TRIALS)}%")
+            axis[i, j].scatter(aboveList[0], aboveList[1], color=ABOVE_COLOR, label=f"{percentage(above, total)}%")
+            axis[i, j].scatter(onList[0], onList[1], color=EQUAL_COLOR, label=f"{percentage(on, total)}%")
+            axis[i, j].scatter(belowList[0], belowList[1], color=BELOW_COLOR, label=f"{percentage(below, total)}%")
 
-            totalMax = max(max(CESPol[:NUM_TO_SHOW]), max(RCVPol[:NUM_TO_SHOW]))
+            totalMax = max(max(CESPol), max(RCVPol))
             axis[i, j].set_xlim(0, totalMax)
             axis[i, j].set_ylim(0, totalMax)
             axis[i, j].legend(loc="upper left")
 
-            print(f"{mean}, {deviation}, {percentage(below, TRIALS)}, {percentage(on, TRIALS)}, {percentage(above, TRIALS)}")
+            print(f"{mean}, {deviation}, {percentage(below, total)}, {percentage(on, total)}, {percentage(above, total)}")
 
     figure.tight_layout()
     plt.savefig('GraphArray.png')
@@ -0,0 +1,37 @@
+"""
+This file saves and loads the checkpoints that let long simulation runs resume after a crash or preemption.
+
+A checkpoint is any picklable state (partial aggregates, the next trial index, generator state, ...). It is written to
+a temporary file next to the target and then renamed over it, so a run killed mid-write leaves the previous
+checkpoint intact.
+"""
+
+import os
+import pickle
+
+""" This function atomically writes state to the checkpoint file at path. """
+def save_checkpoint(path, state):
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as file:
+        pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+""" This function returns the state saved at path, or None if there is no checkpoint there yet. """
+def load_checkpoint(path):
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+"""
+This function loads the checkpoint at path and checks that it was written by a run with the same configuration, so a
+resumed run cannot silently mix results from different settings. It returns None if there is no checkpoint.
+"""
+def load_matching_checkpoint(path, configuration):
+    state = load_checkpoint(path)
+    if state is not None and state['configuration'] != configuration:
+        raise ValueError(f'The checkpoint at {path} was written by a run with a different configuration: '
+                         f'{state["configuration"]}')
+    return state
@@ -1,24 +1,84 @@
-from general_distributions import runGeneralDistributionVoters
-from candidate_graphs import computeStatistics
+from adaptive_stopping import run_until_precise
+from general_distributions import runGeneralDistributionVoters, publishNormalPrefixSums, NUM_GRAPH_SECTIONS
+from result_sinks import StatisticsSink
+from results_store import ResultsStore, RESULTS_PATH
+from shared_arrays import release_array
+from sweep_scheduler import run_sweep, grid_cells
 import matplotlib.pyplot as plt
 
+# Trials of every cell. With a TARGET_WIDTH, TRIALS is only a cap: each cell runs batches of trials until the 95%
+# confidence intervals of its "No Worse" and "Tied" shares are both narrower than TARGET_WIDTH (see adaptive_stopping)
+TRIALS = 10000
+TARGET_WIDTH = None
+
+
+# (tied, better, trials) counts of one cell, from exactly maxTrials trials or, with a targetWidth, adaptively
+def runCell(rng, targetWidth, maxTrials, showProgress=True, **kwargs):
+    if targetWidth is None:
+        statistics = StatisticsSink(sampleSize=0)
+        runGeneralDistributionVoters(trials=maxTrials, sink=statistics, rng=rng, showProgress=showProgress, **kwargs)
+        return statistics.numEqual, statistics.numBelow, statistics.count
+
+    def runBatch(trials, seed):
+        statistics = StatisticsSink(sampleSize=0)
+        runGeneralDistributionVoters(trials=trials, sink=statistics, rng=seed, showProgress=False, **kwargs)
+        return statistics.numAbove, statistics.numEqual, statistics.numBelow
+
+    estimate = run_until_precise(runBatch, targetWidth, max_trials=maxTrials, rng=rng)
+    return estimate.num_equal, estimate.num_below, estimate.trials
+
+
+# Full configuration of a cell (on the normal distribution, loc=0.5 and scale=0.2 unless parameters say otherwise),
+# which keys its counts in the results store
+def cellConfiguration(parameters, targetWidth, maxTrials, seed):
+    configuration = {'engine': 'grid', 'distribution': 'normal', 'graphSections': NUM_GRAPH_SECTIONS, 'loc': 0.5,
+                     'scale': 0.2, 'trials': maxTrials, 'targetWidth': targetWidth, 'seed': seed}
+    configuration.update(parameters)
+    return configuration
+
+
+# Counts of a stored cell as (tied, better, trials); raises if the cell has not been simulated yet
+def storedCell(store, configuration):
+    stored = store.get(configuration)
+    if stored is None:
+        raise KeyError(f'No stored results for {configuration}')
+    return stored.numEqual, stored.numBelow, stored.count
+
+
+def storeCell(store, configuration, counts):
+    on, below, total = counts
+    store.put(configuration, (total - on - below, on, below, total))
+
+
+def create_one_graph(targetWidth=TARGET_WIDTH, maxTrials=TRIALS, storePath=RESULTS_PATH):
+    store = ResultsStore(storePath)
+    for i in range(3, 6):
+        configuration = cellConfiguration({'numCandidates': i}, targetWidth, maxTrials, None)
+        if store.get(configuration) is None:
+            storeCell(store, configuration, runCell(None, targetWidth, maxTrials, numCandidates=i))
+            print(f'Computed stats for {i}')
+
+    renderOneGraph(targetWidth, maxTrials, store)
+    store.close()
+
+
+# Draws create_one_graph's figure from the results store alone, without simulating anything
+def renderOneGraph(targetWidth=TARGET_WIDTH, maxTrials=TRIALS, store=RESULTS_PATH):
+    if not isinstance(store, ResultsStore):
+        store = ResultsStore(store)
 
-def create_one_graph():
     tied = []
     betterOrEqual = []
     vals = []
 
     for i in range(3, 6):
-        CES, RCV = runGeneralDistributionVoters(numCandidates=i, trials=10000)
-        above, on, below, colors = computeStatistics(CES, RCV)
+        on, below, total = storedCell(store, cellConfiguration({'numCandidates': i}, targetWidth, maxTrials, None))
 
-        total = len(CES)
         tied.append(float(on) / total)
         betterOrEqual.append((below + on) / float(total))
         vals.append(i)
 
-        print(f'For {i} candidates, RCV is better or equal {betterOrEqual[i-3]} percent of the time')
-        print(f'Computed stats for {i}')
+        print(f'For {i} candidates, RCV is better or equal {betterOrEqual[i-3]} percent of the time ({total} trials)')
 
     plt.xlabel("Number of Candidates in Election")
     plt.ylabel("Share of Elections")
@@ -44,11 +104,69 @@ def create_one_graph():
 NUM_MEANS = 5
 NUM_DEVIATIONS = 5
 
-def create_full_graph():
-    plt.rcParams["figure.figsize"] = (12, 12)
+# Seed for the sweep (every cell draws from its own stream spawned from it), the file finished cells are checkpointed
+# to, whether create_full_graph continues from that file instead of starting over, and the number of worker processes
+# the cells run on (all CPUs if None)
+SEED = None
+CHECKPOINT_PATH = 'full_graph_checkpoint.pkl'
+RESUME = False
+WORKERS = None
+
+
+# One cell of the full graph, run by the sweep scheduler on the prefix sums published for its (loc, scale)
+def fullGraphCell(prefixSums, targetWidth, maxTrials, parameters, seedSequence):
+    return runCell(seedSequence, targetWidth, maxTrials, showProgress=False,
+                   prefixSum=prefixSums[(parameters['loc'], parameters['scale'])], **parameters)
 
+
+# Work per trial grows about linearly with the number of candidates
+def cellCost(parameters):
+    return parameters['numCandidates']
+
+
+def fullGraphAxes():
     means = [0.5 + (0.1 * i) for i in range(NUM_MEANS)]
     deviations = [0.05 * (2 ** i) for i in range(NUM_DEVIATIONS)]
+    return [('loc', means), ('scale', deviations), ('numCandidates', range(3, 101))]
+
+
+# Cells already in the results store are not simulated again, and new ones are stored as they finish. The prefix sums
+# of every (loc, scale) with cells left to run are built once here and shared with the workers (in shareDirectory
+# instead of shared memory if it is given)
+def create_full_graph(checkpointPath=CHECKPOINT_PATH, resume=RESUME, targetWidth=TARGET_WIDTH, maxTrials=TRIALS,
+                      workers=WORKERS, storePath=RESULTS_PATH, shareDirectory=None):
+    store = ResultsStore(storePath)
+
+    def lookup(parameters):
+        stored = store.get(cellConfiguration(parameters, targetWidth, maxTrials, SEED))
+        return (stored.numEqual, stored.numBelow, stored.count) if stored is not None else None
+
+    axes = fullGraphAxes()
+    prefixSums = publishNormalPrefixSums(dict.fromkeys((parameters['loc'], parameters['scale'])
+                                                       for _, parameters in grid_cells(axes)
+                                                       if lookup(parameters) is None), directory=shareDirectory)
+
+    # Every cell is simulated before anything is drawn
+    try:
+        run_sweep(fullGraphCell, axes, args=(targetWidth, maxTrials), cost=cellCost, workers=workers, seed=SEED,
+                  checkpoint_path=checkpointPath, resume=resume, lookup=lookup, shared=(prefixSums,),
+                  on_result=lambda parameters, counts: storeCell(
+                      store, cellConfiguration(parameters, targetWidth, maxTrials, SEED), counts))
+    finally:
+        for handle in prefixSums.values():
+            release_array(handle)
+
+    renderFullGraph(targetWidth, maxTrials, store)
+    store.close()
+
+
+# Draws create_full_graph's figure from the results store alone, without simulating anything
+def renderFullGraph(targetWidth=TARGET_WIDTH, maxTrials=TRIALS, store=RESULTS_PATH):
+    if not isinstance(store, ResultsStore):
+        store = ResultsStore(store)
+    plt.rcParams["figure.figsize"] = (12, 12)
+
+    (_, means), (_, deviations), (_, candidateCounts) = fullGraphAxes()
 
     figure, axis = plt.subplots(NUM_MEANS, NUM_DEVIATIONS)
 
@@ -59,16 +177,15 @@ def create_full_graph():
             betterOrEqual = []
             vals = []
 
-            for NUM_CANDIDATES in range(3, 101):
-                CES, RCV = runGeneralDistributionVoters(loc=mean, scale=deviation, trials=10000, numCandidates=NUM_CANDIDATES)
-                above, on, below, colors = computeStatistics(CES, RCV)
+            for NUM_CANDIDATES in candidateCounts:
+                on, below, total = storedCell(store, cellConfiguration(
+                    {'loc': mean, 'scale': deviation, 'numCandidates': NUM_CANDIDATES}, targetWidth, maxTrials, SEED))
 
-                total = len(CES)
                 tied.append(float(on) / total)
                 betterOrEqual.append((below + on) / float(total))
                 vals.append(NUM_CANDIDATES)
 
-                print(f'For {NUM_CANDIDATES} candidates with mean {mean} and standard deviation {deviation}, RCV is better or equal {betterOrEqual[NUM_CANDIDATES-3]} percent of the time')
+                print(f'For {NUM_CANDIDATES} candidates with mean {mean} and standard deviation {deviation}, RCV is better or equal {betterOrEqual[NUM_CANDIDATES-3]} percent of the time ({total} trials)')
 
             axis[i, j].set_title(f'μ = {mean}, σ = {deviation}')
 
@@ -89,4 +206,6 @@ def create_full_graph():
     plt.savefig('all_graphs.png')
     plt.show()
 
-create_full_graph()
\ No newline at end of file
+
+if __name__ == '__main__':
+    create_full_graph()
\ No newline at end of file
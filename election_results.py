@@ -0,0 +1,45 @@
+"""
+This file holds what the election engines hand back to their callers: small result records, and one switch for the
+diagnostics that used to be printed unconditionally.
+
+The engines stay silent by default, so bulk runs do no string formatting and no terminal I/O. Raise the verbosity to
+see the engines narrate each election (1 prints winners and polarization, 2 also prints every vote breakdown), or
+install an event hook to receive the same information as data.
+"""
+
+from collections import namedtuple
+
+""" The winner(s), polarization level, and final vote breakdown of a primary/general (CES) election. """
+CESResult = namedtuple('CESResult', ['winner', 'polarization', 'tally'])
+
+""" The winner, polarization level, elimination order, and final first-choice breakdown of an RCV election. """
+RCVResult = namedtuple('RCVResult', ['winner', 'polarization', 'eliminated', 'tally'])
+
+RESULTS = 1
+BREAKDOWNS = 2
+
+VERBOSITY = 0
+EVENT_HOOK = None
+
+""" This function sets how much the engines print: 0 for nothing, RESULTS, or BREAKDOWNS. """
+def set_verbosity(level):
+    global VERBOSITY
+    VERBOSITY = level
+
+"""
+This function installs a hook that is called as hook(event, details) for every diagnostic the engines report, where
+event is a short name such as "left_primary" and details is a dict. Pass None to remove it.
+"""
+def set_event_hook(hook):
+    global EVENT_HOOK
+    EVENT_HOOK = hook
+
+"""
+This function reports one diagnostic. The message is given as separate parts and only joined into a string when the
+verbosity is at least level, so silent runs never format anything.
+"""
+def report(event, level, *message, **details):
+    if EVENT_HOOK is not None:
+        EVENT_HOOK(event, details)
+    if VERBOSITY >= level:
+        print("".join(str(part) for part in message))
@@ -1,3 +1,6 @@
+import functools
+import heapq
+import inspect
 import math
 
 from scipy.interpolate import UnivariateSpline
@@ -7,6 +10,16 @@ import numpy as np
 import random
 from tqdm import tqdm
 
+from accelerated_kernels import prefix_sum_ces_winners, prefix_sum_rcv_winners, resolve_backend
+from analytic_distributions import NormalCDF, UniformCDF, SplineCDF, runAnalyticElection
+from checkpoints import save_checkpoint, load_matching_checkpoint
+from parallel_runs import run_sharded, describe, SHARD_SIZE
+from prefix_sum_cache import PrefixSumCache
+from qmc_sampling import QMC_SCRAMBLES, make_qmc_engine, draw_points, scramble_size, polarization_shares
+from result_sinks import ArraySink, StatisticsSink, CHUNK_SIZE
+from shared_arrays import SharedArrayHandle, publish_array, attach_array, release_array
+from spline_bank import SplineBank, randomBSpline
+
 RANDOMIZE_CANDIDATES = True
 NUM_CANDIDATES = 4
 LEFT_CANDIDATES = 2
@@ -17,6 +30,16 @@ NUM_SPLINE_SECTIONS = 10
 
 GRAPH_SCALE = 1
 
+# Trials between checkpoints when runGeneralDistributionVoters is given a checkpointPath
+CHECKPOINT_EVERY = 1000000
+
+# Discretized distributions are cached between runs: PREFIX_SUM_CACHE_BYTES bounds the in-memory cache, and setting
+# PREFIX_SUM_CACHE_DIR also keeps them on disk as memory-mapped files. Both are read whenever the cache is used, so they
+# can be changed at any time
+PREFIX_SUM_CACHE_BYTES = 1024 ** 3
+PREFIX_SUM_CACHE_DIR = None
+prefixSumCache = PrefixSumCache(PREFIX_SUM_CACHE_BYTES, PREFIX_SUM_CACHE_DIR)
+
 
 def getVoterProportions(prefixSum, candidates):
     leftBound = 0
@@ -53,25 +76,141 @@ def findCESWinnerValue(prefixSum, medianLoc, candidates, leftCandidates, rightCa
     return winners[0] if proportions[0] >= proportions[1] else winners[1]
 
 
+# Eliminates the candidate with the lowest share (the leftmost on ties) until one is left. Surviving candidates form a
+# doubly linked list and their shares sit in a min-heap, so an elimination only recomputes the shares of its two
+# neighbours; heap entries from before a recomputation are skipped when they come up.
 def findRCVWinnerValue(prefixSum, candidates):
-    if len(candidates) == 1:
-        return candidates[0]
-
-    proportions = np.array(getVoterProportions(prefixSum, candidates))
-
-    # Remove lowest candidate
-    del candidates[np.argmin(proportions)]
-    return findRCVWinnerValue(prefixSum, candidates)
-
-
-def randomSplineDistribution():
+    count = len(candidates)
+    previous = list(range(-1, count - 1))
+    following = list(range(1, count + 1))
+    versions = [0] * count
+    eliminated = [False] * count
+
+    # Same bounds as getVoterProportions: each candidate gets the voters up to the rounded midpoint to its right neighbour
+    def share(i):
+        leftBound = 0 if previous[i] < 0 else round((candidates[previous[i]] + candidates[i]) / 2) + 1
+        rightBound = len(prefixSum) - 1 if following[i] == count else round((candidates[i] + candidates[following[i]]) / 2)
+        return prefixSum[rightBound] - prefixSum[leftBound]
+
+    heap = [(share(i), i, 0) for i in range(count)]
+    heapq.heapify(heap)
+
+    for _ in range(count - 1):
+        _, lowest, version = heapq.heappop(heap)
+        while eliminated[lowest] or version != versions[lowest]:
+            _, lowest, version = heapq.heappop(heap)
+
+        # Remove lowest candidate
+        eliminated[lowest] = True
+        left, right = previous[lowest], following[lowest]
+        if left >= 0:
+            following[left] = right
+        if right < count:
+            previous[right] = left
+
+        for neighbour in (left, right):
+            if 0 <= neighbour < count:
+                versions[neighbour] += 1
+                heapq.heappush(heap, (share(neighbour), neighbour, versions[neighbour]))
+
+    return candidates[eliminated.index(False)]
+
+
+# The batched engines below run one election per row of a (trials x C) matrix of sorted candidate locations, all on the
+# same prefixSum, and give the same winners as the engines above.
+
+# Masked array of every active candidate's share of the voters from 0 to lastBound, with the bounds of
+# getVoterProportions taken between each candidate and its nearest active neighbours
+def getVoterProportionsBatch(prefixSum, candidates, active, lastBound):
+    numCandidates = candidates.shape[1]
+    columns = np.arange(numCandidates)
+    previous = np.maximum.accumulate(np.where(active, columns, -1), axis=1)
+    previous = np.concatenate((np.full((len(candidates), 1), -1), previous[:, :-1]), axis=1)
+    following = np.minimum.accumulate(np.where(active, columns, numCandidates)[:, ::-1], axis=1)[:, ::-1]
+    following = np.concatenate((following[:, 1:], np.full((len(candidates), 1), numCandidates)), axis=1)
+
+    previousCandidates = np.take_along_axis(candidates, np.maximum(previous, 0), axis=1)
+    followingCandidates = np.take_along_axis(candidates, np.minimum(following, numCandidates - 1), axis=1)
+    leftBounds = np.where(previous >= 0, np.rint((previousCandidates + candidates) / 2).astype(np.int64) + 1, 0)
+    rightBounds = np.where(following < numCandidates,
+                           np.rint((candidates + followingCandidates) / 2).astype(np.int64), lastBound)
+
+    # Inactive candidates may sit outside prefixSum (left candidates of a right primary), so they read index 0
+    proportions = prefixSum[np.where(active, rightBounds, 0)] - prefixSum[np.where(active, leftBounds, 0)]
+    return np.ma.masked_array(proportions, mask=~active)
+
+
+def findCESWinnerValues(prefixSum, medianLoc, candidates, leftCounts):
+    rows = np.arange(len(candidates))
+    isLeft = np.arange(candidates.shape[1]) < leftCounts[:, None]
+
+    leftWinners = candidates[rows, getVoterProportionsBatch(prefixSum[:medianLoc], candidates, isLeft,
+                                                            medianLoc - 1).argmax(axis=1)]
+    rightWinners = candidates[rows, getVoterProportionsBatch(prefixSum[medianLoc + 1:], candidates - medianLoc,
+                                                             ~isLeft, len(prefixSum) - medianLoc - 2).argmax(axis=1)]
+
+    # General election between the primary winners, which the left winner takes on ties
+    middle = np.rint((leftWinners + rightWinners) / 2).astype(np.int64)
+    leftProportions = prefixSum[middle] - prefixSum[0]
+    rightProportions = prefixSum[-1] - prefixSum[np.minimum(middle + 1, len(prefixSum) - 1)]
+    winners = np.where(leftProportions >= rightProportions, leftWinners, rightWinners)
+
+    winners = np.where(leftCounts == 0, rightWinners, winners)
+    return np.where(leftCounts == candidates.shape[1], leftWinners, winners)
+
+
+# Eliminates the candidate with the lowest share in every row at once. As in findRCVWinnerValue, surviving candidates
+# are linked to their neighbours and an elimination only recomputes the shares of the two neighbours. Eliminated
+# candidates are masked with an infinite share, which argmin skips without the copy a masked array makes every round.
+def findRCVWinnerValues(prefixSum, candidates):
+    numTrials, numCandidates = candidates.shape
+    rows = np.arange(numTrials)
+    previous = np.tile(np.arange(-1, numCandidates - 1), (numTrials, 1))
+    following = np.tile(np.arange(1, numCandidates + 1), (numTrials, 1))
+    eliminated = np.zeros(candidates.shape, dtype=bool)
+    proportions = getVoterProportionsBatch(prefixSum, candidates, ~eliminated, len(prefixSum) - 1).filled(np.inf)
+
+    def updateProportions(rows, columns):
+        leftBounds = np.where(previous[rows, columns] >= 0,
+                              np.rint((candidates[rows, np.maximum(previous[rows, columns], 0)]
+                                       + candidates[rows, columns]) / 2).astype(np.int64) + 1, 0)
+        rightBounds = np.where(following[rows, columns] < numCandidates,
+                               np.rint((candidates[rows, columns]
+                                        + candidates[rows, np.minimum(following[rows, columns], numCandidates - 1)])
+                                       / 2).astype(np.int64), len(prefixSum) - 1)
+        proportions[rows, columns] = prefixSum[rightBounds] - prefixSum[leftBounds]
+
+    for _ in range(numCandidates - 1):
+        # Remove lowest candidate
+        lowest = proportions.argmin(axis=1)
+        eliminated[rows, lowest] = True
+        proportions[rows, lowest] = np.inf
+
+        left, right = previous[rows, lowest], following[rows, lowest]
+        hasLeft, hasRight = left >= 0, right < numCandidates
+        following[rows[hasLeft], left[hasLeft]] = right[hasLeft]
+        previous[rows[hasRight], right[hasRight]] = left[hasRight]
+
+        updateProportions(rows[hasLeft], left[hasLeft])
+        updateProportions(rows[hasRight], right[hasRight])
+
+    return candidates[rows, eliminated.argmin(axis=1)]
+
+
+def randomSplineDistribution(rng=None):
     xValues = np.linspace(0, 1, num=NUM_SPLINE_SECTIONS)
-    yValues = np.random.rand(NUM_SPLINE_SECTIONS)
+    yValues = rng.random(NUM_SPLINE_SECTIONS) if rng is not None else np.random.rand(NUM_SPLINE_SECTIONS)
     return UnivariateSpline(xValues, yValues, k=5)
 
 
-def randomNormalDistribution():
-    return lambda distribution: norm.pdf(distribution, random.random() * 0.4)
+# Random B-spline electorate; runs that recreate it draw whole blocks of them from a SplineBank
+def randomBSplineDistribution(rng=None):
+    return randomBSpline(rng, numBasis=NUM_SPLINE_SECTIONS)
+
+
+def randomNormalDistribution(rng=None):
+    dLoc = rng.random() * 0.4 if rng is not None else random.random() * 0.4
+    return lambda distribution: norm.pdf(distribution, dLoc)
 
 
 def normalDistribution(dLoc=0.5, dScale=0.2):
@@ -82,74 +221,294 @@ def uniformDistribution():
     return lambda distribution: uniform.pdf(distribution)
 
 
-def runGeneralDistributionVoters(loc=0.5, scale=0.2, trials=500000, graphSections=NUM_GRAPH_SECTIONS,
-                                 numCandidates=NUM_CANDIDATES, randomizeCandidates=RANDOMIZE_CANDIDATES,
-                                 leftCandidates=LEFT_CANDIDATES, rightCandidates=RIGHT_CANDIDATES, isNormal=True,
-                                 distributionToUse=normalDistribution, recreateDistribution=False, trialsPerRecreation=100):
-    CESPolarization = []
-    RCVPolarization = []
+# Distribution factories that build the same distribution every time for the same parameters
+CACHEABLE_DISTRIBUTIONS = (normalDistribution, uniformDistribution)
 
-    if isNormal:
-        distribution = distributionToUse(dLoc=loc, dScale=scale)
-    else:
-        distribution = distributionToUse()
 
+# Exact counterparts of the distribution factories for the analytic engine, taking the generator and the factory's
+# own arguments
+ANALYTIC_DISTRIBUTIONS = {
+    normalDistribution: lambda rng, dLoc=0.5, dScale=0.2: NormalCDF(dLoc, dScale),
+    randomNormalDistribution: lambda rng: NormalCDF(rng.random() * 0.4, 1),
+    uniformDistribution: lambda rng: UniformCDF(),
+    randomSplineDistribution: lambda rng: SplineCDF(randomSplineDistribution(rng)),
+    randomBSplineDistribution: lambda rng: SplineCDF(randomBSplineDistribution(rng)),
+}
+
+
+# Build a distribution, handing the generator to factories that draw random parameters
+def makeDistribution(distributionToUse, rng, **kwargs):
+    if 'rng' in inspect.signature(distributionToUse).parameters:
+        kwargs['rng'] = rng
+    return distributionToUse(**kwargs)
+
+
+@functools.lru_cache(maxsize=8)
+def gridIntervals(graphSections):
     intervals = np.linspace(0, 1, num=graphSections)
-    intervalHeights = distribution(intervals)
+    intervals.flags.writeable = False
+    return intervals
+
 
-    prefixSum = np.append([0], np.cumsum(intervalHeights))
+# Random splines can dip below zero between their knots; those points hold no voters rather than negative ones
+def buildPrefixSum(distribution, graphSections):
+    prefixSum = np.append([0], np.cumsum(np.maximum(distribution(gridIntervals(graphSections)), 0)))
     medianLoc = np.searchsorted(prefixSum, prefixSum[-1] / 2)
+    return prefixSum, medianLoc
 
-    for trial in tqdm(range(trials)):
-        # Recreate distribution if necessary
-        if recreateDistribution and trial % trialsPerRecreation == 0:
-            distribution = distributionToUse()
-            intervalHeights = distribution(intervals)
-
-            prefixSum = np.append([0], np.cumsum(intervalHeights))
-            medianLoc = np.searchsorted(prefixSum, prefixSum[-1] / 2)
-
-        # Sorted list of candidates
-        candidates = []
-
-        if randomizeCandidates:
-            # Randomly pick candidates from voter distribution
-            while len(candidates) < numCandidates:
-                randomCandidate = random.randint(0, math.floor(prefixSum[-1]) * 5000) / 5000.
-                candidateLocation = np.searchsorted(prefixSum, randomCandidate)
-
-                if candidateLocation != medianLoc:
-                    candidates.append(candidateLocation)
-
-            candidates.sort()
-
-            # Count left and right candidates
-            leftCandidates = 0
-            rightCandidates = 0
-            for candidate in candidates:
-                if candidate < medianLoc:
-                    leftCandidates += 1
-                else:
-                    rightCandidates += 1
-        else:
-            # Generate random left candidates
-            while len(candidates) < leftCandidates:
-                candidates.append(random.randrange(1, medianLoc))
 
-            # Generate random right candidates
-            while len(candidates) < rightCandidates:
-                candidates.append(random.randrange(medianLoc + 1, graphSections))
+# The (prefixSum, medianLoc) of a distribution on a grid of graphSections points, cached for deterministic factories
+def getPrefixSum(distributionToUse, graphSections, rng=None, isNormal=True, loc=0.5, scale=0.2):
+    if isNormal:
+        key = (describe(distributionToUse), loc, scale, graphSections)
+        build = lambda: buildPrefixSum(distributionToUse(dLoc=loc, dScale=scale), graphSections)
+    else:
+        key = (describe(distributionToUse), graphSections)
+        build = lambda: buildPrefixSum(makeDistribution(distributionToUse, rng), graphSections)
+
+    if distributionToUse not in CACHEABLE_DISTRIBUTIONS:
+        return build()
+    prefixSumCache.configure(PREFIX_SUM_CACHE_BYTES, PREFIX_SUM_CACHE_DIR)
+    return prefixSumCache.get(key, build)
+
+
+# Publish the prefix sums of the normal distribution at every (loc, scale) in locScales once, for sweeps whose cells
+# run on them (see shared_arrays). Returns the handles by (loc, scale); each must be released with release_array
+def publishNormalPrefixSums(locScales, graphSections=NUM_GRAPH_SECTIONS, directory=None):
+    handles = {}
+    for loc, scale in locScales:
+        prefixSum, _ = buildPrefixSum(normalDistribution(dLoc=loc, dScale=scale), graphSections)
+        handles[(loc, scale)] = publish_array(prefixSum, directory)
+    return handles
+
+
+# Draw a (trials x numCandidates) block of sorted candidate locations from the voter distribution, redrawing any that
+# land on the median, and return it with the number of left candidates in each trial
+def sampleCandidateBlock(prefixSum, medianLoc, trials, numCandidates, rng, draws=None):
+    highest = math.floor(prefixSum[-1]) * 5000
+    if draws is None:
+        masses = rng.integers(0, highest, size=(trials, numCandidates), endpoint=True)
+    else:
+        masses = np.floor(draws * (highest + 1))
+    candidates = np.searchsorted(prefixSum, masses / 5000.)
+
+    collisions = np.flatnonzero(candidates == medianLoc)
+    while len(collisions) > 0:
+        redrawn = np.searchsorted(prefixSum, rng.integers(0, highest, size=len(collisions), endpoint=True) / 5000.)
+        candidates.flat[collisions] = redrawn
+        collisions = collisions[redrawn == medianLoc]
 
-            candidates.sort()
+    candidates.sort(axis=1)
+    return candidates, np.count_nonzero(candidates < medianLoc, axis=1)
 
-        # Find election winners
-        CESWinner = findCESWinnerValue(prefixSum, medianLoc, candidates, leftCandidates, rightCandidates)
-        RCVWinner = findRCVWinnerValue(prefixSum, candidates)
 
-        CESPolarization.append(abs(CESWinner - medianLoc) * GRAPH_SCALE / graphSections)
-        RCVPolarization.append(abs(RCVWinner - medianLoc) * GRAPH_SCALE / graphSections)
+# Place leftCandidates uniformly left of the median and rightCandidates uniformly right of it in each of trials trials
+def placeCandidateBlock(medianLoc, graphSections, trials, leftCandidates, rightCandidates, rng, draws=None):
+    if draws is None:
+        left = rng.integers(1, medianLoc, size=(trials, leftCandidates))
+        right = rng.integers(medianLoc + 1, graphSections, size=(trials, rightCandidates))
+        candidates = np.concatenate((left, right), axis=1)
+    else:
+        left = 1 + np.floor(draws[:, :leftCandidates] * (medianLoc - 1))
+        right = medianLoc + 1 + np.floor(draws[:, leftCandidates:] * (graphSections - medianLoc - 1))
+        candidates = np.concatenate((left, right), axis=1).astype(np.int64)
+    candidates.sort(axis=1)
+    return candidates, np.full(trials, leftCandidates)
+
 
-    return CESPolarization, RCVPolarization
+def getAnalyticDistribution(distributionToUse, rng, isNormal=True, loc=0.5, scale=0.2):
+    if distributionToUse not in ANALYTIC_DISTRIBUTIONS:
+        raise ValueError(f'There is no analytic form of {describe(distributionToUse)}')
+    if isNormal:
+        return ANALYTIC_DISTRIBUTIONS[distributionToUse](rng, dLoc=loc, dScale=scale)
+    return ANALYTIC_DISTRIBUTIONS[distributionToUse](rng)
+
+
+def runGeneralDistributionVoters(loc=0.5, scale=0.2, trials=500000, graphSections=NUM_GRAPH_SECTIONS,
+                                 numCandidates=NUM_CANDIDATES, randomizeCandidates=RANDOMIZE_CANDIDATES,
+                                 leftCandidates=LEFT_CANDIDATES, rightCandidates=RIGHT_CANDIDATES, isNormal=True,
+                                 distributionToUse=normalDistribution, recreateDistribution=False, trialsPerRecreation=100,
+                                 rng=None, showProgress=True, sink=None, chunkSize=CHUNK_SIZE,
+                                 checkpointPath=None, checkpointEvery=CHECKPOINT_EVERY, resume=False, engine='grid',
+                                 backend='numpy', prefixSum=None, sampler='random'):
+    # Polarization is staged in fixed-size chunks and handed to the sink, which by default keeps every trial in memory
+    if sink is None:
+        sink = ArraySink(trials)
+    CESPolarization = np.empty(chunkSize)
+    RCVPolarization = np.empty(chunkSize)
+    seeded = rng is not None
+    rng = np.random.default_rng(rng)
+    initialState = rng.bit_generator.state
+    backend = resolve_backend(backend)
+
+    # Checkpoints are taken at chunk boundaries and hold everything needed to continue the run exactly. A seeded run
+    # is identified by the state its generator started in; an unseeded one saves that state in the checkpoint and
+    # rewinds to it on resume, so a fixed random distribution is rebuilt exactly as the interrupted run built it
+    configuration = (loc, scale, trials, graphSections, numCandidates, randomizeCandidates, leftCandidates,
+                     rightCandidates, isNormal, describe(distributionToUse), recreateDistribution, trialsPerRecreation,
+                     chunkSize, engine, sampler, initialState if seeded else None)
+    checkpoint = load_matching_checkpoint(checkpointPath, configuration) if resume else None
+    if checkpoint is not None:
+        rng.bit_generator.state = checkpoint['initialRng']
+    checkpointChunks = max(1, checkpointEvery // chunkSize)
+    firstTrial = 0
+
+    # The grid engine works on the prefix sums of the distribution on graphSections points, the analytic engine on
+    # its exact CDF (see analytic_distributions)
+    if engine == 'analytic':
+        distribution = getAnalyticDistribution(distributionToUse, rng, isNormal, loc, scale)
+    elif engine == 'grid' and prefixSum is not None:
+        # Prefix sums computed by the caller, possibly published to this worker through shared_arrays
+        if isinstance(prefixSum, SharedArrayHandle):
+            prefixSum = attach_array(prefixSum)
+        medianLoc = np.searchsorted(prefixSum, prefixSum[-1] / 2)
+    elif engine == 'grid':
+        prefixSum, medianLoc = getPrefixSum(distributionToUse, graphSections, rng, isNormal, loc, scale)
+    else:
+        raise ValueError(f'Unknown engine {engine!r}')
+
+    # With sampler='sobol' or 'halton', the candidates of each trial are placed with the next point of a scrambled QMC
+    # sequence (see qmc_sampling), with one coordinate per candidate
+    qmcEngine = make_qmc_engine(sampler, numCandidates if randomizeCandidates else leftCandidates + rightCandidates, rng)
+
+    # Recreated B-spline electorates come from a bank that builds a whole block of them at a time
+    splineBank = None
+    if engine == 'grid' and recreateDistribution and distributionToUse is randomBSplineDistribution:
+        splineBank = SplineBank(graphSections, numBasis=NUM_SPLINE_SECTIONS)
+
+    if checkpoint is not None:
+        firstTrial = checkpoint['trial']
+        rng.bit_generator.state = checkpoint['rng']
+        sink.setState(checkpoint['sink'])
+        if recreateDistribution and engine == 'analytic':
+            distribution = checkpoint['distribution']
+        elif recreateDistribution:
+            prefixSum, medianLoc = checkpoint['prefixSum'], checkpoint['medianLoc']
+        if splineBank is not None:
+            splineBank.setState(checkpoint['splineBank'])
+        if qmcEngine is not None:
+            qmcEngine = checkpoint['qmcEngine']
+
+    # Trials run in blocks that end at every chunk boundary (and every recreation); the grid engine draws and runs a
+    # whole block of elections at once
+    progress = tqdm(initial=firstTrial, total=trials, disable=not showProgress)
+    blockStart = firstTrial
+    while blockStart < trials:
+        chunkStart = blockStart - blockStart % chunkSize
+        blockEnd = min(trials, chunkStart + chunkSize)
+        if recreateDistribution:
+            blockEnd = min(blockEnd, (blockStart // trialsPerRecreation + 1) * trialsPerRecreation)
+        block = slice(blockStart - chunkStart, blockEnd - chunkStart)
+        draws = draw_points(qmcEngine, blockEnd - blockStart) if qmcEngine is not None else None
+
+        if engine == 'analytic':
+            if recreateDistribution and blockStart % trialsPerRecreation == 0:
+                distribution = getAnalyticDistribution(distributionToUse, rng, isNormal=False)
+
+            for i in range(block.start, block.stop):
+                CESWinner, RCVWinner = runAnalyticElection(distribution, numCandidates, randomizeCandidates,
+                                                           leftCandidates, rightCandidates, rng,
+                                                           draws[i - block.start] if draws is not None else None)
+                CESPolarization[i] = abs(CESWinner - distribution.median) * GRAPH_SCALE
+                RCVPolarization[i] = abs(RCVWinner - distribution.median) * GRAPH_SCALE
+        else:
+            # Recreate distribution if necessary
+            if splineBank is not None and blockStart % trialsPerRecreation == 0:
+                prefixSum, medianLoc = splineBank.draw(rng)
+            elif recreateDistribution and blockStart % trialsPerRecreation == 0:
+                prefixSum, medianLoc = getPrefixSum(distributionToUse, graphSections, rng, isNormal=False)
+
+            # Sorted candidates of every trial in the block
+            if randomizeCandidates:
+                candidates, leftCounts = sampleCandidateBlock(prefixSum, medianLoc, blockEnd - blockStart,
+                                                              numCandidates, rng, draws)
+            else:
+                candidates, leftCounts = placeCandidateBlock(medianLoc, graphSections, blockEnd - blockStart,
+                                                             leftCandidates, rightCandidates, rng, draws)
+
+            # Find election winners, with the compiled kernels of accelerated_kernels if backend='numba'
+            if backend == 'numba':
+                CESWinners = prefix_sum_ces_winners(prefixSum, medianLoc, candidates, leftCounts)
+                RCVWinners = prefix_sum_rcv_winners(prefixSum, candidates)
+            else:
+                CESWinners = findCESWinnerValues(prefixSum, medianLoc, candidates, leftCounts)
+                RCVWinners = findRCVWinnerValues(prefixSum, candidates)
+
+            CESPolarization[block] = np.abs(CESWinners - medianLoc) * GRAPH_SCALE / graphSections
+            RCVPolarization[block] = np.abs(RCVWinners - medianLoc) * GRAPH_SCALE / graphSections
+
+        progress.update(blockEnd - blockStart)
+        blockStart = blockEnd
+
+        if blockEnd % chunkSize == 0 or blockEnd == trials:
+            sink.append(CESPolarization[:block.stop], RCVPolarization[:block.stop])
+
+            if checkpointPath is not None and (blockEnd // chunkSize % checkpointChunks == 0 or blockEnd == trials):
+                state = {'configuration': configuration, 'trial': blockEnd, 'initialRng': initialState,
+                         'rng': rng.bit_generator.state, 'sink': sink.getState()}
+                if recreateDistribution and engine == 'analytic':
+                    state['distribution'] = distribution
+                elif recreateDistribution:
+                    state['prefixSum'], state['medianLoc'] = prefixSum, medianLoc
+                if splineBank is not None:
+                    state['splineBank'] = splineBank.getState()
+                if qmcEngine is not None:
+                    state['qmcEngine'] = qmcEngine
+                save_checkpoint(checkpointPath, state)
+
+    progress.close()
+    return sink.result()
+
+
+# prefixSum is the handle of the prefix sums published for every shard, or None
+def runGeneralDistributionShard(prefixSum, kwargs, statistics, trials, rng):
+    if prefixSum is not None:
+        kwargs = dict(kwargs, prefixSum=prefixSum)
+    if statistics is None:
+        return runGeneralDistributionVoters(trials=trials, rng=rng, showProgress=False, **kwargs)
+
+    sink = StatisticsSink(rng=rng.integers(2 ** 63), **statistics)
+    runGeneralDistributionVoters(trials=trials, rng=rng, showProgress=False, sink=sink, **kwargs)
+    return sink
+
+
+# Same as runGeneralDistributionVoters, but the trials are split into shards run on worker processes. A given seed
+# gives bit-identical results for any number of workers. If statistics is a dict of StatisticsSink arguments, each
+# shard only keeps running aggregates and the merged StatisticsSink is returned instead of the polarization arrays.
+# With a checkpointPath, finished shards are saved as they complete and resume=True skips them on a rerun.
+# When every shard runs on the same fixed distribution, its prefix sums are built once here and published to the
+# workers through shared memory (or memory-mapped files in shareDirectory) instead of being rebuilt by each of them.
+def runGeneralDistributionVotersParallel(trials=500000, workers=None, seed=None, shardSize=SHARD_SIZE, statistics=None,
+                                         checkpointPath=None, resume=False, shareDirectory=None, **kwargs):
+    arguments = inspect.signature(runGeneralDistributionVoters).bind_partial(**kwargs)
+    arguments.apply_defaults()
+    options = arguments.arguments
+    # Validated here, once, rather than in every worker
+    resolve_backend(options['backend'])
+    handle = None
+    if (options['engine'] == 'grid' and not options['recreateDistribution'] and options['prefixSum'] is None
+            and options['distributionToUse'] in CACHEABLE_DISTRIBUTIONS):
+        prefixSum, _ = getPrefixSum(options['distributionToUse'], options['graphSections'], None, options['isNormal'],
+                                    options['loc'], options['scale'])
+        handle = publish_array(prefixSum, shareDirectory)
+
+    try:
+        return run_sharded(runGeneralDistributionShard, trials, args=(kwargs, statistics), seed=seed, workers=workers,
+                           shard_size=shardSize, checkpoint_path=checkpointPath, resume=resume, shared=(handle,))
+    finally:
+        if handle is not None:
+            release_array(handle)
+
+
+# Same as runGeneralDistributionVotersParallel, but the candidates come from the sampler's QMC sequence and the trials
+# are split into scrambles independent scrambles, one shard each. Returns the polarization arrays and the share of
+# trials where RCV polarization is greater than, equal to and less than CES polarization, each with its standard error
+# across scrambles (see qmc_sampling.polarization_shares).
+def runGeneralDistributionVotersQMC(trials=500000, sampler='sobol', scrambles=QMC_SCRAMBLES, workers=None, seed=None,
+                                    **kwargs):
+    CESPolarization, RCVPolarization = runGeneralDistributionVotersParallel(
+        trials, workers, seed, shardSize=scramble_size(trials, scrambles), sampler=sampler, **kwargs)
+    return CESPolarization, RCVPolarization, polarization_shares(CESPolarization, RCVPolarization, trials, scrambles)
 
 
 def runAndShowGeneralDistributionVoters(nLoc=0.5, nScale=0.2, nTrials=500000):
@@ -0,0 +1,200 @@
+"""
+This file runs the discrete-voter elections of standard_election in a two-dimensional issue space. Voters and
+candidates are points in the square from (0, 0) to (20, 20), and every voter ranks the candidates by distance, so a
+voter's first choice is the nearest candidate. First choices come from nearest-neighbour queries on a
+scipy.spatial.cKDTree built over the candidates, which keeps elections with a million voters fast.
+
+Parties are split along a chosen party axis (a direction in the plane, left to right by default): voters and
+candidates whose projection onto the axis is at or below the median voter's are in the left party, the rest in the
+right party. Candidates are ordered along the axis, so ties go to the candidate furthest left on it, as they do in one
+dimension. Polarization is the distance from the winner to the median voter (the coordinate-wise median).
+
+In RCV, only the voters of an eliminated candidate are queried again, against a tree of the surviving candidates.
+"""
+
+import sys
+import numpy as np
+from scipy.spatial import cKDTree
+
+from election_results import CESResult, RCVResult, RESULTS, BREAKDOWNS, report, set_verbosity
+from parallel_runs import run_sharded
+
+PARTY_AXIS = (1.0, 0.0)
+
+"""
+This function generates num_voters voters and num_candidates candidates uniformly in the square from (0, 0) to
+(20, 20) and returns them as (voters x 2) and (candidates x 2) arrays. rng can be a np.random.Generator or a seed.
+"""
+def generate_voters_candidates_2d(num_voters, num_candidates, rng=None):
+    rng = np.random.default_rng(rng)
+    return rng.random((num_voters, 2)) * 20, rng.random((num_candidates, 2)) * 20
+
+""" This helper returns the projection of every point onto the party axis. """
+def project(points, party_axis=PARTY_AXIS):
+    axis = np.asarray(party_axis, dtype=float)
+    return np.asarray(points, dtype=float) @ (axis / np.linalg.norm(axis))
+
+""" This helper turns a point into the tuple of floats that the vote breakdowns are keyed by. """
+def position(point):
+    return tuple(float(coordinate) for coordinate in point)
+
+"""
+This function is the plurality kernel of the 2-D engine. It returns the number of first-choice votes of each candidate
+and the index of every voter's nearest candidate.
+"""
+def plurality_tally_2d(voters, candidates):
+    _, nearest = cKDTree(candidates).query(voters, workers=-1)
+    return np.bincount(nearest, minlength=len(candidates)), nearest
+
+"""
+This helper sorts the candidates along the party axis and returns them with the voters as float arrays, the median
+voter, and every voter's and candidate's projection onto the axis.
+"""
+def prepare_election(voters, candidates, party_axis):
+    voters = np.asarray(voters, dtype=float)
+    candidates = np.asarray(candidates, dtype=float)
+    candidate_side = project(candidates, party_axis)
+    order = np.argsort(candidate_side, kind='stable')
+    return voters, candidates[order], np.median(voters, axis=0), project(voters, party_axis), candidate_side[order]
+
+"""
+This function runs a primary in each party and then a general election between the primary winners, and returns a
+CESResult whose polarization is the winner's distance from the median voter. A tied general election is scored at the
+midpoint of the two finalists, as standard_election.ultimate_winner does.
+"""
+def find_ces_winner_2d(voters, candidates, party_axis=PARTY_AXIS):
+    voters, candidates, median_voter, voter_side, candidate_side = prepare_election(voters, candidates, party_axis)
+    median_side = np.median(voter_side)
+
+    finalists = []
+    for party, voter_mask, candidate_mask in (("left", voter_side <= median_side, candidate_side <= median_side),
+                                              ("right", voter_side > median_side, candidate_side > median_side)):
+        party_candidates = np.flatnonzero(candidate_mask)
+        if len(party_candidates) == 0:
+            report(party + "_primary", RESULTS, "There is no ", party, " primary", winners=[])
+            continue
+        total_votes, _ = plurality_tally_2d(voters[voter_mask], candidates[party_candidates])
+        winner = party_candidates[np.argmax(total_votes)]
+        report(party + "_primary", RESULTS, "The ", party, " primary winner is ", position(candidates[winner]),
+               winners=[position(candidates[winner])], tally=total_votes)
+        finalists.append(winner)
+
+    if len(finalists) == 1:
+        winners = [position(candidates[finalists[0]])]
+        breakdown = {winners[0]: len(voters)}
+        winner = candidates[finalists[0]]
+    else:
+        total_votes, _ = plurality_tally_2d(voters, candidates[finalists])
+        breakdown = {position(candidates[finalist]): int(votes) for finalist, votes in zip(finalists, total_votes)}
+        if total_votes[0] == total_votes[1]:
+            winners = list(breakdown)
+            winner = candidates[finalists].mean(axis=0)
+        else:
+            winners = [position(candidates[finalists[np.argmax(total_votes)]])]
+            winner = candidates[finalists[np.argmax(total_votes)]]
+        report("general_breakdown", BREAKDOWNS, "The ultimate Vote Breakdown is ", breakdown, tally=breakdown)
+
+    polarization = float(np.linalg.norm(winner - median_voter))
+    report("general", RESULTS, "The ultimate winner is ", winners, "\nThe polarization level for this election is ",
+           polarization, winners=winners, polarization=polarization)
+    return CESResult(winners, polarization, breakdown)
+
+"""
+This function runs an RCV election and returns an RCVResult. As in standard_election.create_rcv_winner_1d, a candidate
+with a majority of first choices wins, and otherwise the candidate with the fewest (but some) first choices is
+eliminated, the leftmost along the party axis on ties. Every candidate's voters are kept together, so an elimination
+only re-queries the eliminated candidate's voters against the surviving candidates.
+"""
+def find_rcv_winner_2d(voters, candidates, party_axis=PARTY_AXIS):
+    voters, candidates, median_voter = prepare_election(voters, candidates, party_axis)[:3]
+    half_voters = len(voters) / 2
+    first_choice_tally, nearest = plurality_tally_2d(voters, candidates)
+    order = np.argsort(nearest, kind='stable')
+    voters_of = np.split(order, np.cumsum(first_choice_tally)[:-1])
+    surviving = np.ones(len(candidates), dtype=bool)
+    eliminated = []
+
+    while first_choice_tally.max() <= half_voters:
+        least_votes = np.argmin(np.where(first_choice_tally > 0, first_choice_tally, np.inf))
+        surviving[least_votes] = False
+        eliminated.append(position(candidates[least_votes]))
+
+        # Hand the eliminated candidate's voters to their nearest surviving candidate
+        moved = voters_of[least_votes]
+        voters_of[least_votes] = moved[:0]
+        first_choice_tally[least_votes] = 0
+        remaining = np.flatnonzero(surviving)
+        _, nearest = cKDTree(candidates[remaining]).query(voters[moved], workers=-1)
+        new_choice = remaining[nearest]
+        order = np.argsort(new_choice, kind='stable')
+        counts = np.bincount(new_choice, minlength=len(candidates))
+        for candidate, group in zip(np.flatnonzero(counts), np.split(moved[order], np.cumsum(counts[counts > 0])[:-1])):
+            voters_of[candidate] = np.concatenate((voters_of[candidate], group))
+        first_choice_tally += counts
+
+    top_candidate = np.argmax(first_choice_tally)
+    breakdown = {position(candidates[i]): int(first_choice_tally[i]) for i in np.flatnonzero(first_choice_tally)}
+    winner = position(candidates[top_candidate])
+    polarization = float(np.linalg.norm(candidates[top_candidate] - median_voter))
+    report("rcv_breakdown", BREAKDOWNS, "The first choice vote breakdown is ", breakdown, tally=breakdown)
+    report("rcv", RESULTS, "The winning ranked choice candidate is ", winner, "\nThe polarization level is ",
+           polarization, winner=winner, polarization=polarization)
+    return RCVResult(winner, polarization, eliminated, breakdown)
+
+"""
+This function runs num_run random 2-D elections and returns the CES and RCV polarization of each. Its arguments are
+ordered for run_sharded, which passes the number of trials and a np.random.Generator last.
+"""
+def simulate_elections_2d(num_voters, num_candidates, party_axis, num_run, rng=None):
+    rng = np.random.default_rng(rng)
+    ces_polarization = np.empty(num_run)
+    rcv_polarization = np.empty(num_run)
+    for i in range(num_run):
+        voters, candidates = generate_voters_candidates_2d(num_voters, num_candidates, rng)
+        ces_polarization[i] = find_ces_winner_2d(voters, candidates, party_axis).polarization
+        rcv_polarization[i] = find_rcv_winner_2d(voters, candidates, party_axis).polarization
+    return ces_polarization, rcv_polarization
+
+"""
+This function prints how often RCV polarization is above, equal to, and below CES polarization in num_run random 2-D
+elections, run in shards on the given number of worker processes (see standard_election.report_percentages).
+"""
+def report_percentages_2d(num_voters, num_candidates, num_run, party_axis=PARTY_AXIS, workers=1, seed=None):
+    ces_polarization, rcv_polarization = run_sharded(simulate_elections_2d, num_run,
+                                                     args=(num_voters, num_candidates, tuple(party_axis)),
+                                                     seed=seed, workers=workers)
+    percentages = {}
+    for key, count in (("RCV > normal", np.sum(rcv_polarization > ces_polarization)),
+                       ("RCV = normal", np.sum(rcv_polarization == ces_polarization)),
+                       ("RCV < normal", np.sum(rcv_polarization < ces_polarization))):
+        if count > 0:
+            percentages[key] = int(count)
+    print(percentages)
+
+
+def main():
+    args = sys.argv[1:]
+    if str(args[0]) == "once":
+        """Run one 2-D election, where the first input is the number of voters, the second is the number of
+        candidates"""
+        set_verbosity(BREAKDOWNS)
+        voters, candidates = generate_voters_candidates_2d(int(args[1]), int(args[2]))
+        print("The candidates in this election are " + str([position(candidate) for candidate in candidates]))
+        print("")
+        print("In a typical, plurality, primary system:")
+        find_ces_winner_2d(voters, candidates)
+        print("")
+        print("In a ranked choice, voting system:")
+        find_rcv_winner_2d(voters, candidates)
+    elif str(args[0]) == "percentages":
+        """Print how often RCV generates higher extremism than CES in 2-D. The first input is the number of voters,
+        the second is the number of candidates, and the third is the number of elections run. An optional fourth input
+        is the number of worker processes to use"""
+        workers = int(args[4]) if len(args) > 4 else 1
+        report_percentages_2d(int(args[1]), int(args[2]), int(args[3]), workers=workers)
+    else:
+        raise Exception("No option was selected")
+
+
+if __name__ == '__main__':
+    main()
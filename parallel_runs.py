@@ -0,0 +1,108 @@
+"""
+This file splits Monte Carlo trials into shards and runs them across worker processes.
+
+The trials are always cut into the same fixed-size shards, and shard i always draws from the i-th generator spawned
+from np.random.SeedSequence(seed). The results are merged in shard order, so a given seed gives bit-identical results
+no matter how many workers run the shards (including running them all in this process with workers=1).
+"""
+
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import accelerated_kernels
+from checkpoints import save_checkpoint, load_checkpoint, load_matching_checkpoint
+
+SHARD_SIZE = 100000
+
+""" This function returns the number of trials in each shard. """
+def shard_sizes(num_trials, shard_size=SHARD_SIZE):
+    return [min(shard_size, num_trials - start) for start in range(0, num_trials, shard_size)]
+
+""" This function runs one shard in a worker, building its generator from the shard's SeedSequence. """
+def run_shard(shard_function, args, num_trials, seed_sequence):
+    return shard_function(*args, num_trials, np.random.default_rng(seed_sequence))
+
+"""
+This function merges the results of every shard, in shard order. Each shard returns either one result or a tuple of
+them; arrays are concatenated, numbers (such as counts) are added, and accumulators with a merge method (such as
+result_sinks.StatisticsSink) are merged into the first shard's.
+"""
+def merge_results(results):
+    if hasattr(results[0], 'merge'):
+        merged = results[0]
+        for result in results[1:]:
+            merged = merged.merge(result)
+        return merged
+    if isinstance(results[0], tuple):
+        return tuple(merge_results([result[i] for result in results]) for i in range(len(results[0])))
+    if isinstance(results[0], np.ndarray) or isinstance(results[0], list):
+        return np.concatenate(results)
+    return sum(results)
+
+"""
+This helper describes a shard function and its arguments in a form that can be compared between runs, naming
+functions by module and name instead of by their address in memory.
+"""
+def describe(value):
+    if callable(value):
+        return getattr(value, '__module__', '') + '.' + getattr(value, '__qualname__', repr(value))
+    if isinstance(value, dict):
+        return tuple(sorted((key, describe(item)) for key, item in value.items()))
+    if isinstance(value, (tuple, list)):
+        return tuple(describe(item) for item in value)
+    return value
+
+""" This function returns the path the result of shard i of a run checkpointed to checkpoint_path is saved at. """
+def shard_checkpoint_path(checkpoint_path, i):
+    return f'{checkpoint_path}.shard{i}'
+
+"""
+This function runs num_trials trials of shard_function across workers processes (all CPUs when workers is None) and
+returns the merged results. shard_function is called as shard_function(*args, shard_trials, rng), where rng is a
+np.random.Generator, and must be defined at the top level of a module so the workers can import it.
+
+If checkpoint_path is given, the result of every finished shard is saved next to it (see shard_checkpoint_path) and the
+checkpoint itself records which shards are done, and a later call with the same arguments and resume=True only runs
+the shards that are missing. Because every shard has its own generator, the resumed run returns exactly what an
+uninterrupted run would have (the entropy of an unseeded run is saved too).
+
+shared holds arguments that are passed to shard_function ahead of args but do not change any shard's result, such as
+the handles of arrays published to the workers with shared_arrays. They are left out of the checkpoint's configuration.
+"""
+def run_sharded(shard_function, num_trials, args=(), seed=None, workers=None, shard_size=SHARD_SIZE,
+                checkpoint_path=None, resume=False, shared=()):
+    sizes = shard_sizes(num_trials, shard_size)
+    configuration = (describe(shard_function), num_trials, describe(args), seed, shard_size)
+    args = tuple(shared) + tuple(args)
+    state = load_matching_checkpoint(checkpoint_path, configuration) if resume else None
+    if state is None:
+        state = {'configuration': configuration, 'entropy': np.random.SeedSequence(seed).entropy, 'completed': set()}
+    seed_sequences = np.random.SeedSequence(state['entropy']).spawn(len(sizes))
+    results = {i: load_checkpoint(shard_checkpoint_path(checkpoint_path, i)) for i in state['completed']}
+    remaining = [i for i in range(len(sizes)) if i not in results]
+    if workers is None:
+        workers = os.cpu_count()
+
+    # Each shard's result is written once, to its own file, so the checkpoint stays small however many shards are done
+    def finish_shard(i, result):
+        results[i] = result
+        if checkpoint_path is not None:
+            save_checkpoint(shard_checkpoint_path(checkpoint_path, i), result)
+            state['completed'].add(i)
+            save_checkpoint(checkpoint_path, state)
+
+    if workers == 1 or len(remaining) <= 1:
+        for i in remaining:
+            finish_shard(i, run_shard(shard_function, args, sizes[i], seed_sequences[i]))
+    elif len(remaining) > 0:
+        with ProcessPoolExecutor(max_workers=min(workers, len(remaining)),
+                                 mp_context=accelerated_kernels.pool_context(),
+                                 initializer=accelerated_kernels.init_pool_worker,
+                                 initargs=(accelerated_kernels.VALIDATED,)) as pool:
+            futures = {pool.submit(run_shard, shard_function, args, sizes[i], seed_sequences[i]): i
+                       for i in remaining}
+            for future in as_completed(futures):
+                finish_shard(futures[future], future.result())
+
+    return merge_results([results[i] for i in range(len(sizes))])
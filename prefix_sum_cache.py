@@ -0,0 +1,74 @@
+"""
+This file caches the discretized distributions that general_distributions runs its elections on. Building one means
+evaluating the density on the whole grid and taking its cumulative sum, which is the same work every time the same
+distribution, parameters, and grid size come back (as they do across the cells of a sweep).
+
+The cache keeps (prefixSum, medianLoc) pairs in memory, evicting the least recently used ones once their arrays take
+more than maxBytes. If a directory is given, every prefix sum is also written there as a .npy file and later loaded as
+a read-only memory map, so other processes and later runs skip the setup too. Cached arrays are read-only.
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PrefixSumCache:
+
+    def __init__(self, maxBytes, directory=None):
+        self.maxBytes = maxBytes
+        self.directory = directory
+        self.entries = OrderedDict()
+        self.totalBytes = 0
+
+    # Return the cached (prefixSum, medianLoc) for key, calling build() to make it on a miss
+    def get(self, key, build):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        path = self.pathFor(key)
+        if path is not None and os.path.exists(path):
+            prefixSum = np.load(path, mmap_mode='r')
+            medianLoc = np.searchsorted(prefixSum, prefixSum[-1] / 2)
+        else:
+            prefixSum, medianLoc = build()
+            prefixSum.flags.writeable = False
+            if path is not None:
+                np.save(path + '.tmp.npy', prefixSum)
+                os.replace(path + '.tmp.npy', path)
+
+        self.store(key, (prefixSum, medianLoc))
+        return prefixSum, medianLoc
+
+    def store(self, key, entry):
+        # Memory-mapped arrays count in full too: every page an election touches stays resident while the map is open
+        entryBytes = entry[0].nbytes
+        if entryBytes > self.maxBytes:
+            return
+        self.entries[key] = entry
+        self.totalBytes += entryBytes
+        self.evict()
+
+    # Change the budget and the directory later entries are kept in, evicting entries down to the new budget
+    def configure(self, maxBytes, directory):
+        self.maxBytes = maxBytes
+        self.directory = directory
+        self.evict()
+
+    def evict(self):
+        while self.totalBytes > self.maxBytes:
+            oldKey, oldEntry = self.entries.popitem(last=False)
+            self.totalBytes -= oldEntry[0].nbytes
+
+    def pathFor(self, key):
+        if self.directory is None:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, hashlib.sha1(repr(key).encode()).hexdigest() + '.npy')
+
+    def clear(self):
+        self.entries.clear()
+        self.totalBytes = 0
@@ -0,0 +1,71 @@
+"""
+This file draws candidate positions from randomized quasi-Monte Carlo sequences instead of plain pseudo-random numbers.
+Each trial takes the next point of a scrambled Sobol or Halton sequence, with one coordinate per candidate, and the
+engines map the coordinates through the inverse CDF of the voter distribution (for uniform voters, a scaling) to get
+the candidates. The points fill the unit cube much more evenly than independent draws, so proportions computed over
+the trials converge faster.
+
+A single QMC run has no usable sampling error, so the trials are split into independent scrambles of the sequence:
+each scramble is one run_sharded shard, with its own generator and so its own scrambling, and the spread of the
+estimates across scrambles gives their standard error. Voters that are drawn for every trial (in standard_election)
+are still pseudo-random; only the candidates use the sequence.
+"""
+
+import math
+import warnings
+
+import numpy as np
+from scipy.stats import qmc
+
+from parallel_runs import shard_sizes
+
+SAMPLERS = ('random', 'sobol', 'halton')
+
+# Number of independent scrambles a randomized QMC run is split into
+QMC_SCRAMBLES = 16
+
+"""
+This function returns a scrambled QMC engine of the given sampler ('sobol' or 'halton') for points with one coordinate
+per dimension, scrambled with a seed drawn from rng. It returns None for sampler='random'.
+"""
+def make_qmc_engine(sampler, dimension, rng):
+    if sampler not in SAMPLERS:
+        raise ValueError(f'Unknown sampler {sampler!r}, expected one of {SAMPLERS}')
+    if sampler == 'random':
+        return None
+    seed = int(rng.integers(2 ** 63))
+    if sampler == 'sobol':
+        return qmc.Sobol(dimension, scramble=True, seed=seed)
+    return qmc.Halton(dimension, scramble=True, seed=seed)
+
+"""
+This function returns the next num_points points of engine as a (num_points x dimension) array in [0, 1). Sobol
+sequences are best balanced over powers of two points, but any block size gives valid points, so SciPy's warning about
+it is silenced.
+"""
+def draw_points(engine, num_points):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        return engine.random(num_points)
+
+""" This function returns the number of trials in each of num_scrambles scrambles of num_trials trials. """
+def scramble_size(num_trials, num_scrambles=QMC_SCRAMBLES):
+    return max(1, math.ceil(num_trials / num_scrambles))
+
+"""
+This function takes the CES and RCV polarization of num_trials trials run as scrambles of scramble_size(num_trials,
+num_scrambles) trials each (in order), and returns the share of trials where RCV polarization is greater than, equal
+to, and less than CES polarization. Each share is a (share, standard error) pair, where the standard error is the
+spread of the shares of the independent scrambles.
+"""
+def polarization_shares(ces_polarization, rcv_polarization, num_trials, num_scrambles=QMC_SCRAMBLES):
+    sizes = np.array(shard_sizes(num_trials, scramble_size(num_trials, num_scrambles)))
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    shares = {}
+    for key, outcome in (("RCV > normal", rcv_polarization > ces_polarization),
+                         ("RCV = normal", rcv_polarization == ces_polarization),
+                         ("RCV < normal", rcv_polarization < ces_polarization)):
+        scramble_shares = np.add.reduceat(outcome, starts) / sizes
+        error = scramble_shares.std(ddof=1) / math.sqrt(len(sizes)) if len(sizes) > 1 else math.nan
+        shares[key] = (float(np.count_nonzero(outcome) / num_trials), float(error))
+    return shares
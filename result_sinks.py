@@ -0,0 +1,212 @@
+"""
+This file holds the result sinks that runGeneralDistributionVoters writes the CES and RCV polarization of its trials
+into. The simulation hands a sink one chunk of trials at a time through append(CESPolarization, RCVPolarization), and
+result() returns the two polarization arrays written so far.
+
+ArraySink keeps everything in a preallocated NumPy buffer. MemmapSink streams fixed-size chunks to a (trials x 2) .npy
+file on disk, so very long runs have a fixed memory footprint and the results can later be opened with
+loadPolarization without reading them into memory. StatisticsSink keeps no per-trial data at all, only running
+aggregates and a bounded sample.
+
+Every sink can hand out its contents with getState() and restore them with setState(), which is what checkpointed runs
+save and resume from.
+"""
+
+import copy
+import os
+import numpy as np
+
+CHUNK_SIZE = 65536
+
+
+class ArraySink:
+    """ Preallocated in-memory buffer for the polarization of up to capacity trials. """
+
+    def __init__(self, capacity, dtype=np.float64):
+        self.CESPolarization = np.empty(capacity, dtype=dtype)
+        self.RCVPolarization = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def append(self, CESPolarization, RCVPolarization):
+        end = self.size + len(CESPolarization)
+        self.CESPolarization[self.size:end] = CESPolarization
+        self.RCVPolarization[self.size:end] = RCVPolarization
+        self.size = end
+
+    def result(self):
+        return self.CESPolarization[:self.size], self.RCVPolarization[:self.size]
+
+    def getState(self):
+        return {'CESPolarization': self.CESPolarization[:self.size].copy(),
+                'RCVPolarization': self.RCVPolarization[:self.size].copy()}
+
+    def setState(self, state):
+        self.size = 0
+        self.append(state['CESPolarization'], state['RCVPolarization'])
+
+    def close(self):
+        pass
+
+
+class MemmapSink:
+    """
+    Streams the polarization of up to capacity trials to a memory-mapped .npy file at path, whose column 0 is CES and
+    column 1 is RCV. Trials are staged in a chunkSize buffer and written out (and flushed) a whole chunk at a time.
+    With resume=True an existing file is reopened instead of overwritten, so a checkpointed run can continue it.
+    """
+
+    def __init__(self, path, capacity, dtype=np.float64, chunkSize=CHUNK_SIZE, resume=False):
+        self.path = path
+        if resume and os.path.exists(path):
+            self.data = np.lib.format.open_memmap(path, mode='r+')
+        else:
+            self.data = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(capacity, 2))
+        self.buffer = np.empty((chunkSize, 2), dtype=dtype)
+        self.buffered = 0
+        self.size = 0
+
+    def append(self, CESPolarization, RCVPolarization):
+        start = 0
+        while start < len(CESPolarization):
+            count = min(len(CESPolarization) - start, len(self.buffer) - self.buffered)
+            self.buffer[self.buffered:self.buffered + count, 0] = CESPolarization[start:start + count]
+            self.buffer[self.buffered:self.buffered + count, 1] = RCVPolarization[start:start + count]
+            self.buffered += count
+            start += count
+            if self.buffered == len(self.buffer):
+                self.flush()
+
+    def flush(self):
+        self.data[self.size:self.size + self.buffered] = self.buffer[:self.buffered]
+        self.data.flush()
+        self.size += self.buffered
+        self.buffered = 0
+
+    def result(self):
+        self.flush()
+        return self.data[:self.size, 0], self.data[:self.size, 1]
+
+    # Everything before size is already flushed to the file, so only the staged chunk needs saving
+    def getState(self):
+        self.data.flush()
+        return {'size': self.size, 'buffer': self.buffer[:self.buffered].copy()}
+
+    def setState(self, state):
+        self.size = state['size']
+        self.buffered = 0
+        self.append(state['buffer'][:, 0], state['buffer'][:, 1])
+
+    def close(self):
+        self.flush()
+        del self.data
+
+
+# Open the polarization written by a MemmapSink without copying it into memory
+def loadPolarization(path):
+    data = np.load(path, mmap_mode='r')
+    return data[:, 0], data[:, 1]
+
+
+class StatisticsSink:
+    """
+    Keeps running aggregates instead of per-trial data, updated one chunk of trials at a time:
+    - how many trials had RCV polarization above, equal to, and below CES polarization,
+    - the running mean and variance of CES and RCV polarization (Welford's algorithm, merged chunk by chunk),
+    - a histogramBins x histogramBins histogram of (CES, RCV) polarization over [0, histogramRange],
+    - a uniform random sample of at most sampleSize trials for scatter plots (a reservoir that keeps the trials with
+      the smallest random keys, drawn from rng).
+    result() returns the (CES, RCV) polarization of the sampled trials. Sinks filled by separate runs can be combined
+    with merge().
+    """
+
+    STATE_FIELDS = ('numAbove', 'numEqual', 'numBelow', 'count', 'mean', 'sumSquares', 'histogramRange', 'histogram',
+                    'sampleSize', 'sampleKeys', 'sample', 'rng')
+
+    def __init__(self, sampleSize=1000, histogramBins=100, histogramRange=1.0, rng=None):
+        self.numAbove = 0
+        self.numEqual = 0
+        self.numBelow = 0
+        self.count = 0
+        self.mean = np.zeros(2)
+        self.sumSquares = np.zeros(2)
+        self.histogramRange = histogramRange
+        self.histogram = np.zeros((histogramBins, histogramBins), dtype=np.int64)
+        self.sampleSize = sampleSize
+        self.sampleKeys = np.empty(0)
+        self.sample = np.empty((0, 2))
+        self.rng = np.random.default_rng(rng)
+
+    @property
+    def size(self):
+        return self.count
+
+    def append(self, CESPolarization, RCVPolarization):
+        values = np.column_stack((CESPolarization, RCVPolarization)).astype(np.float64)
+        if len(values) == 0:
+            return
+
+        self.numAbove += int(np.count_nonzero(values[:, 1] > values[:, 0]))
+        self.numEqual += int(np.count_nonzero(values[:, 1] == values[:, 0]))
+        self.numBelow += int(np.count_nonzero(values[:, 1] < values[:, 0]))
+
+        chunkMean = values.mean(axis=0)
+        self.combineMoments(len(values), chunkMean, ((values - chunkMean) ** 2).sum(axis=0))
+
+        clipped = np.clip(values, 0, self.histogramRange)
+        self.histogram += np.histogram2d(clipped[:, 0], clipped[:, 1], bins=len(self.histogram),
+                                         range=[[0, self.histogramRange], [0, self.histogramRange]])[0].astype(np.int64)
+
+        if self.sampleSize > 0:
+            self.keepSample(self.rng.random(len(values)), values)
+
+    def combineMoments(self, count, mean, sumSquares):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = self.mean + delta * count / total
+        self.sumSquares = self.sumSquares + sumSquares + delta ** 2 * self.count * count / total
+        self.count = total
+
+    def keepSample(self, keys, values):
+        keys = np.concatenate((self.sampleKeys, keys))
+        values = np.concatenate((self.sample, values))
+        if len(keys) > self.sampleSize:
+            kept = np.argpartition(keys, self.sampleSize - 1)[:self.sampleSize]
+            kept.sort()
+            keys, values = keys[kept], values[kept]
+        self.sampleKeys = keys
+        self.sample = values
+
+    def merge(self, other):
+        self.numAbove += other.numAbove
+        self.numEqual += other.numEqual
+        self.numBelow += other.numBelow
+        if other.count > 0:
+            self.combineMoments(other.count, other.mean, other.sumSquares)
+        self.histogram += other.histogram
+        if self.sampleSize > 0:
+            self.keepSample(other.sampleKeys, other.sample)
+        return self
+
+    def variance(self):
+        return self.sumSquares / self.count if self.count > 0 else np.full(2, np.nan)
+
+    # Split the sampled trials into [[CES], [RCV]] lists of RCV above, equal to, and below CES
+    def partition(self):
+        parts = []
+        for mask in (self.sample[:, 1] > self.sample[:, 0], self.sample[:, 1] == self.sample[:, 0],
+                     self.sample[:, 1] < self.sample[:, 0]):
+            parts.append([self.sample[mask, 0].tolist(), self.sample[mask, 1].tolist()])
+        return tuple(parts)
+
+    def result(self):
+        return self.sample[:, 0], self.sample[:, 1]
+
+    def getState(self):
+        return copy.deepcopy({name: getattr(self, name) for name in self.STATE_FIELDS})
+
+    def setState(self, state):
+        for name, value in copy.deepcopy(state).items():
+            setattr(self, name, value)
+
+    def close(self):
+        pass
@@ -0,0 +1,69 @@
+"""
+This file keeps the results of simulation runs in a local SQLite database, so graphs can be drawn again (with other
+colours, titles or axis limits) without simulating anything, and a cell that has been computed once is never computed
+again.
+
+Every result is keyed by the full configuration of the run that produced it, a dict such as {'engine': 'grid',
+'distribution': 'normal', 'loc': 0.5, 'scale': 0.2, 'numCandidates': 4, 'trials': 10000, 'seed': None}, written as
+canonical JSON so that the same configuration always finds the same row. A row holds the outcome counts of the run
+(how many trials had RCV polarization above, equal to, and below CES polarization, out of how many) and optionally a
+sample of (CES, RCV) polarization pairs for scatter plots. Rows are committed as they are written, so an interrupted
+sweep keeps everything it finished.
+"""
+
+import io
+import json
+import sqlite3
+from collections import namedtuple
+
+import numpy as np
+
+from parallel_runs import describe
+
+RESULTS_PATH = 'results.sqlite'
+
+""" One stored run: its outcome counts and its (trials x 2) sample of (CES, RCV) polarization, or None. """
+StoredResult = namedtuple('StoredResult', ['numAbove', 'numEqual', 'numBelow', 'count', 'sample'])
+
+
+# Canonical JSON of a configuration; NumPy scalars are written as plain numbers and functions by their names
+def configurationKey(configuration):
+    return json.dumps(configuration, sort_keys=True,
+                      default=lambda value: value.item() if isinstance(value, np.generic) else describe(value))
+
+
+class ResultsStore:
+    """ The results database at path (an in-memory one if path is None), read with get() and written with put(). """
+
+    def __init__(self, path=RESULTS_PATH):
+        self.connection = sqlite3.connect(path if path is not None else ':memory:')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS results (configuration TEXT PRIMARY KEY, '
+                                'numAbove INTEGER, numEqual INTEGER, numBelow INTEGER, count INTEGER, sample BLOB)')
+        self.connection.commit()
+
+    def get(self, configuration):
+        row = self.connection.execute('SELECT numAbove, numEqual, numBelow, count, sample FROM results '
+                                      'WHERE configuration = ?', (configurationKey(configuration),)).fetchone()
+        if row is None:
+            return None
+        sample = np.load(io.BytesIO(row[4])) if row[4] is not None else None
+        return StoredResult(*row[:4], sample)
+
+    # counts are (numAbove, numEqual, numBelow, count); a stored row for the same configuration is replaced
+    def put(self, configuration, counts, sample=None):
+        blob = None
+        if sample is not None:
+            buffer = io.BytesIO()
+            np.save(buffer, np.asarray(sample, dtype=np.float64))
+            blob = buffer.getvalue()
+        self.connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)',
+                                (configurationKey(configuration), *(int(count) for count in counts), blob))
+        self.connection.commit()
+        return self.get(configuration)
+
+    # Configurations of every stored run
+    def configurations(self):
+        return [json.loads(key) for key, in self.connection.execute('SELECT configuration FROM results')]
+
+    def close(self):
+        self.connection.close()
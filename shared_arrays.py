@@ -0,0 +1,123 @@
+"""
+This file publishes large read-only arrays (prefix sums, or whole banks of them) to worker processes without copying
+them into every worker. The parent publishes an array once and passes the small handle it gets back to the workers,
+which attach to the same memory by name and get a read-only NumPy view of it.
+
+Arrays are published through multiprocessing.shared_memory, or as .npy files in a directory (opened as memory maps)
+where /dev/shm is too small. Every segment gets a name of its own, made of the publisher's process id and a random
+suffix, so processes that publish the same array never share (and unlink) each other's segments. Within one process,
+publishing an array with the same contents again returns the same handle and only adds a reference. The parent
+releases each reference when it is done and the segment is unlinked with the last one. Workers keep their attachments
+open until they exit.
+
+Handles differ from run to run, so they should not be part of a checkpoint's configuration; run_sharded and run_sweep
+take them as shared arguments for that reason.
+"""
+
+import hashlib
+import os
+import secrets
+import sys
+from collections import namedtuple
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+""" What a worker needs to attach to a published array: kind is 'memory' or 'file', and name the segment or path. """
+SharedArrayHandle = namedtuple('SharedArrayHandle', ['kind', 'name', 'shape', 'dtype'])
+
+# Arrays published by this process: handle -> [segment or None, array, references, content key], and their handles
+# by content key
+PUBLISHED = {}
+HANDLES = {}
+# Arrays this process has attached to: handle -> (segment or None, array)
+ATTACHED = {}
+
+"""
+This helper opens an existing shared memory segment without registering it with the resource tracker, which would
+otherwise unlink it (or warn about it) when a worker that only attached to it exits. Python 3.13 added track=False for
+this; earlier versions register unconditionally, so the registration is skipped for the duration of the call.
+"""
+def open_segment(name):
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+"""
+This function publishes a copy of array and returns its handle. With directory=None the copy lives in shared memory,
+otherwise in a .npy file in directory. Every publish must be matched by a release_array.
+"""
+def publish_array(array, directory=None):
+    array = np.ascontiguousarray(array)
+    key = (hashlib.sha1(repr((array.shape, array.dtype.str)).encode() + array.data).hexdigest(), directory)
+    if key in HANDLES:
+        handle = HANDLES[key]
+        PUBLISHED[handle][2] += 1
+        return handle
+
+    name = f'rcv_{os.getpid()}_{secrets.token_hex(6)}'
+    if directory is None:
+        handle = SharedArrayHandle('memory', name, array.shape, array.dtype.str)
+    else:
+        handle = SharedArrayHandle('file', os.path.join(directory, name + '.npy'), array.shape, array.dtype.str)
+
+    if handle.kind == 'memory':
+        segment = SharedMemory(name=handle.name, create=True, size=max(1, array.nbytes))
+        published = np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)
+        published[...] = array
+    else:
+        os.makedirs(directory, exist_ok=True)
+        np.save(handle.name + '.tmp.npy', array)
+        os.replace(handle.name + '.tmp.npy', handle.name)
+        segment = None
+        published = np.load(handle.name, mmap_mode='r')
+
+    published.flags.writeable = False
+    PUBLISHED[handle] = [segment, published, 1, key]
+    HANDLES[key] = handle
+    return handle
+
+"""
+This function returns a read-only view of the array behind handle, attaching to it the first time it is used in this
+process. In the process that published it, this is the published copy itself.
+"""
+def attach_array(handle):
+    if handle in PUBLISHED:
+        return PUBLISHED[handle][1]
+    if handle not in ATTACHED:
+        if handle.kind == 'memory':
+            segment = open_segment(handle.name)
+            array = np.ndarray(handle.shape, dtype=np.dtype(handle.dtype), buffer=segment.buf)
+        else:
+            segment = None
+            array = np.load(handle.name, mmap_mode='r')
+        array.flags.writeable = False
+        ATTACHED[handle] = (segment, array)
+    return ATTACHED[handle][1]
+
+""" This function drops one reference to a published array and frees it once the last one is released. """
+def release_array(handle):
+    entry = PUBLISHED[handle]
+    entry[2] -= 1
+    if entry[2] > 0:
+        return
+
+    segment = entry[0]
+    del PUBLISHED[handle]
+    del HANDLES[entry[3]]
+    del entry[:]
+    if segment is None:
+        os.remove(handle.name)
+        return
+    segment.unlink()
+    try:
+        segment.close()
+    except BufferError:
+        # A view of the array is still alive here; the memory goes away with it, and the name is already unlinked
+        pass
@@ -0,0 +1,76 @@
+"""
+This file generates random spline electorates for general_distributions in bulk. A random electorate is a degree-5
+B-spline on [0, 1] whose NUM_SPLINE_SECTIONS coefficients are uniform random numbers, so its density is a smooth bump
+shape like randomSplineDistribution's, but it can be built without fitting anything.
+
+The B-spline basis is evaluated on the grid once per grid size. A SplineBank then turns a whole block of random
+coefficient vectors into densities with one (electorates x basis) @ (basis x grid) product, clamps them at zero,
+normalizes each to mean 1 (so prefix sums end at graphSections, as the uniform distribution's do), and keeps the
+(electorates x grid) prefix sums as one contiguous array that is handed out one electorate at a time.
+"""
+
+import functools
+import numpy as np
+from scipy.interpolate import BSpline
+
+NUM_SPLINE_SECTIONS = 10
+SPLINE_DEGREE = 5
+
+# Size of the prefix sums a SplineBank keeps at once, which sets how many electorates it builds per block
+BANK_BYTES = 256 * 1024 * 1024
+
+
+# Clamped knots for numBasis B-splines of the given degree, evenly spaced on [0, 1]
+def splineKnots(numBasis=NUM_SPLINE_SECTIONS, degree=SPLINE_DEGREE):
+    return np.concatenate(([0] * degree, np.linspace(0, 1, numBasis - degree + 1), [1] * degree))
+
+
+# Sparse (graphSections x numBasis) matrix of every basis function on the grid
+@functools.lru_cache(maxsize=4)
+def splineBasis(graphSections, numBasis=NUM_SPLINE_SECTIONS, degree=SPLINE_DEGREE):
+    return BSpline.design_matrix(np.linspace(0, 1, num=graphSections), splineKnots(numBasis, degree), degree)
+
+
+# One random electorate as a scipy BSpline, scaled to integrate to 1 over [0, 1]
+def randomBSpline(rng=None, numBasis=NUM_SPLINE_SECTIONS, degree=SPLINE_DEGREE):
+    coefficients = rng.random(numBasis) if rng is not None else np.random.rand(numBasis)
+    spline = BSpline(splineKnots(numBasis, degree), coefficients, degree)
+    return BSpline(spline.t, coefficients / spline.integrate(0, 1), degree)
+
+
+class SplineBank:
+    """
+    Builds random B-spline electorates on a grid of graphSections points a block of bankSize at a time (by default as
+    many as fit in BANK_BYTES) and hands out their (prefixSum, medianLoc) one at a time with draw(rng). The block's
+    coefficients are its whole state, so getState() and setState() are cheap.
+    """
+
+    def __init__(self, graphSections, bankSize=None, numBasis=NUM_SPLINE_SECTIONS, degree=SPLINE_DEGREE):
+        self.basis = splineBasis(graphSections, numBasis, degree)
+        self.graphSections = graphSections
+        self.bankSize = bankSize if bankSize is not None else max(1, BANK_BYTES // (8 * (graphSections + 1)))
+        self.numBasis = numBasis
+        self.coefficients = np.empty((0, numBasis))
+        self.next = 0
+
+    def fill(self, coefficients):
+        densities = np.maximum(self.basis @ coefficients.T, 0).T
+        self.prefixSums = np.zeros((len(coefficients), self.graphSections + 1))
+        np.cumsum(densities, axis=1, out=self.prefixSums[:, 1:])
+        self.prefixSums *= self.graphSections / self.prefixSums[:, -1:]
+        self.medianLocs = np.count_nonzero(self.prefixSums < self.prefixSums[:, -1:] / 2, axis=1)
+        self.coefficients = coefficients
+        self.next = 0
+
+    def draw(self, rng):
+        if self.next == len(self.coefficients):
+            self.fill(rng.random((self.bankSize, self.numBasis)))
+        self.next += 1
+        return self.prefixSums[self.next - 1], self.medianLocs[self.next - 1]
+
+    def getState(self):
+        return {'coefficients': self.coefficients.copy(), 'next': self.next}
+
+    def setState(self, state):
+        self.fill(state['coefficients'])
+        self.next = state['next']
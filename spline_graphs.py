@@ -12,18 +12,34 @@ NUM_GRAPH_SECTIONS = 50000
 
 DISPLAY_EXAMPLE_GRAPH = False
 
-if DISPLAY_EXAMPLE_GRAPH:
-    displayDist = dist.randomSplineDistribution()
-    intervals = np.linspace(0, 1, num=NUM_GRAPH_SECTIONS)
-    plt.plot(intervals, displayDist(intervals))
-    plt.xlim(0, 1)
-    plt.show()
-
-CESPol, RCVPol = dist.runGeneralDistributionVoters(trials=TRIALS, numCandidates=NUM_CANDIDATES, isNormal=False,
-                                                   distributionToUse=dist.randomSplineDistribution, recreateDistribution=True,
-                                                   trialsPerRecreation=TRIALS_PER_RECREATION)
-
-above, on, below, colors = cand_graphs.computeStatistics(CESPol, RCVPol)
-print(f'Above: {cand_graphs.percentage(above, TRIALS)}, On: {cand_graphs.percentage(on, TRIALS)}, Below: {cand_graphs.percentage(below, TRIALS)}')
-
-cand_graphs.percentage(above, TRIALS)
+# Electorate family; dist.randomBSplineDistribution builds each block of electorates at once from a precomputed basis
+DISTRIBUTION = dist.randomSplineDistribution
+
+# Worker processes for the trials (None uses every CPU) and the seed that makes the run reproducible
+WORKERS = None
+SEED = None
+
+# File that finished shards are checkpointed to, and whether to continue from it instead of starting over
+CHECKPOINT_PATH = 'spline_graphs_checkpoint.pkl'
+RESUME = False
+
+if __name__ == '__main__':
+    if DISPLAY_EXAMPLE_GRAPH:
+        displayDist = DISTRIBUTION()
+        intervals = np.linspace(0, 1, num=NUM_GRAPH_SECTIONS)
+        plt.plot(intervals, displayDist(intervals))
+        plt.xlim(0, 1)
+        plt.show()
+
+    statistics = dist.runGeneralDistributionVotersParallel(trials=TRIALS, workers=WORKERS, seed=SEED,
+                                                           statistics={'sampleSize': 0},
+                                                           checkpointPath=CHECKPOINT_PATH, resume=RESUME,
+                                                           numCandidates=NUM_CANDIDATES, isNormal=False,
+                                                           distributionToUse=DISTRIBUTION,
+                                                           recreateDistribution=True,
+                                                           trialsPerRecreation=TRIALS_PER_RECREATION)
+
+    above, on, below = statistics.numAbove, statistics.numEqual, statistics.numBelow
+    print(f'Above: {cand_graphs.percentage(above, TRIALS)}, On: {cand_graphs.percentage(on, TRIALS)}, Below: {cand_graphs.percentage(below, TRIALS)}')
+
+    cand_graphs.percentage(above, TRIALS)
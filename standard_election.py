@@ -12,6 +12,7 @@ This simulation code is based on a discrete number of voters.
 
 import numpy as np
 import math
+import heapq
 from random import seed
 from random import random
 import statistics
@@ -19,6 +20,14 @@ import sys
 import matplotlib.pyplot as plt
 import matplotlib.mlab as mlab
 from collections import Counter
+from accelerated_kernels import rcv_polarization_batch, resolve_backend
+from adaptive_stopping import run_until_precise
+from parallel_runs import run_sharded, SHARD_SIZE
+from qmc_sampling import QMC_SCRAMBLES, make_qmc_engine, draw_points, scramble_size, polarization_shares
+from election_results import CESResult, RCVResult, RESULTS, BREAKDOWNS, report, set_verbosity
+
+BALLOT_CHUNK_SIZE = 65536
+BATCH_VOTER_ENTRIES = 4194304
 
 """
 This function generates voters and candidates randomly, on a scale from 0 to 20, and returns
@@ -40,232 +49,177 @@ def generate_voters_candidates(num_voters, num_candidates):
     median_candidates = statistics.median(candidates_sorted)
     return voters_sorted, median_voters, candidates_sorted, median_candidates
 
+"""
+This function draws the sorted voters of num_trials elections, as a (trials x voters) matrix, together with the median
+voter of each, conditioned on the election having exactly num_left_candidates of its num_candidates uniform candidates
+at or below the median voter. That condition reweights the voters by the chance P(k | m) = Binom(C, k; m / 20) that k
+of C uniform candidates fall at or below their median m, as rejecting whole elections would. For an odd number of
+voters the median is then drawn directly from its Beta((V + 1) / 2 + k, (V + 1) / 2 + C - k) posterior, and the other
+voters are uniform on either side of it. For an even number of voters, unconditioned voter sets are accepted with
+probability P(k | m) / max P(k | m).
+"""
+def generate_voters_left(num_voters, num_candidates, num_left_candidates, num_trials, rng):
+    num_right_candidates = num_candidates - num_left_candidates
+    if num_voters % 2 == 1:
+        half = num_voters // 2
+        median_voters = 20 * rng.beta(half + 1 + num_left_candidates, half + 1 + num_right_candidates, size=num_trials)
+        below = rng.random((num_trials, half)) * median_voters[:, None]
+        above = 20 - rng.random((num_trials, half)) * (20 - median_voters[:, None])
+        voters = np.sort(np.concatenate((below, median_voters[:, None], above), axis=1), axis=1)
+        return voters, median_voters
+
+    # P(k | m) / max P(k | m) is (p / q)^k ((1 - p) / (1 - q))^(C - k) with p = m / 20 and q = k / C, its maximizer
+    left_share = num_left_candidates / num_candidates
+    voters = np.empty((num_trials, num_voters))
+    filled = 0
+    while filled < num_trials:
+        proposed = np.sort(rng.random((num_trials - filled, num_voters)) * 20, axis=1)
+        share = np.median(proposed, axis=1) / 20
+        with np.errstate(divide='ignore', invalid='ignore'):
+            acceptance = ((share / left_share) ** num_left_candidates
+                          * ((1 - share) / (1 - left_share)) ** num_right_candidates)
+        accepted = proposed[rng.random(len(proposed)) < acceptance]
+        voters[filled:filled + len(accepted)] = accepted
+        filled += len(accepted)
+    return voters, np.median(voters, axis=1)
+
+"""
+This function places candidates for an election that must have exactly num_left_candidates candidates at or below the
+median voter. Given the median voter, candidates drawn uniformly from 0 to 20 and conditioned on that count are just
+num_left_candidates uniform draws from 0 to the median and the rest uniform draws from above the median to 20. The
+condition also changes which voters are likely, so the voters must come from generate_voters_left. It takes in the
+sorted voters' median and a np.random.Generator, and returns the sorted candidates. The median can also be a column of
+medians, with one row of candidates per election. draws, if given, are the uniform draws in [0, 1) to place the
+candidates with instead of rng's.
+"""
+def generate_candidates_left(median_voters, num_candidates, num_left_candidates, rng, draws=None):
+    median_voters = np.asarray(median_voters, dtype=float)
+    if draws is None:
+        draws = rng.random(median_voters.shape + (num_candidates,))
+    is_left = np.arange(num_candidates) < num_left_candidates
+    candidates = np.where(is_left, draws * median_voters[..., None], 20 - draws * (20 - median_voters[..., None]))
+    return np.sort(candidates, axis=-1)
+
+"""
+This function generates voters and candidates for an election with exactly num_left_candidates candidates at or below
+the median voter, drawn like generate_voters_candidates conditioned on that count.
+"""
+def generate_voters_candidates_left(num_voters, num_candidates, num_left_candidates, rng=None):
+    rng = np.random.default_rng(rng)
+    voters, median_voters = generate_voters_left(num_voters, num_candidates, num_left_candidates, 1, rng)
+    voters_sorted, median_voters = voters[0], median_voters[0]
+    candidates_sorted = generate_candidates_left(median_voters, num_candidates, num_left_candidates, rng)
+    return voters_sorted.tolist(), median_voters, candidates_sorted.tolist(), np.median(candidates_sorted)
+
+"""
+This function is the plurality kernel shared by the primaries and the general election. It takes in sorted voters and
+sorted candidates, and returns the number of votes each candidate receives (indexed like the candidates) together with
+the indices of every candidate tied for the most votes. Each candidate wins the voters between the midpoints to its
+neighbours, so the count is one binary search per midpoint. Voters exactly halfway between two candidates vote for the
+left one.
+"""
+def plurality_tally(voters_sorted, candidates_sorted):
+    voters = np.asarray(voters_sorted, dtype=float)
+    candidates = np.asarray(candidates_sorted, dtype=float)
+    boundaries = np.searchsorted(voters, (candidates[:-1] + candidates[1:]) / 2, side='right')
+    total_votes = np.diff(np.concatenate(([0], boundaries, [len(voters)])))
+    all_winners = np.flatnonzero(total_votes == total_votes.max())
+    return total_votes, all_winners
+
 """
 This function generates the winner in the left party in a primary system. It returns a list of
-all the winners. It takes in a list of all voters, the median voter, a list of all candidates, and the
-median candidate.
+all the winners. It takes in a list of all voters (sorted), the median voter, a list of all candidates (sorted), and
+the median candidate.
 """
 def generate_winners_left(all_voters, median_voters, all_candidates, median_candidates):
-    # Check to make sure that there will be a left primary
-    counter = 0
-    for i in range(len(all_candidates)):
-        if all_candidates[i] > median_voters:
-            counter += 1
+    all_voters = np.asarray(all_voters, dtype=float)
+    all_candidates = np.asarray(all_candidates, dtype=float)
+    left_candidates = all_candidates[all_candidates <= median_voters]
 
-    if counter == len(all_candidates):
-        print("There is no left primary")
+    # Check to make sure that there will be a left primary
+    if len(left_candidates) == 0:
+        report("left_primary", RESULTS, "There is no left primary", winners=[])
         return []
 
-    left_voters = []
-    for i in range(len(all_voters)):
-        if all_voters[i] <= median_voters:
-            left_voters.append(all_voters[i])
-    left_candidates = []
-    for i in range(len(all_candidates)):
-        if all_candidates[i] <= median_voters:
-            left_candidates.append(all_candidates[i])
-
     if len(left_candidates) == 1:
-        print("The left primary winner is " + str(left_candidates))
-        return left_candidates
-    median_left_candidates = statistics.median(left_candidates)
-    total_votes = {}
-
-    for i in range(len(left_voters)):
-        if left_voters[i] <= median_left_candidates:
-            minimum = left_voters[i] - left_candidates[0]
-            for j in range(len(left_candidates)):
-                difference = abs(left_voters[i] - left_candidates[j])
-                if difference <= minimum:
-                    minimum = difference
-                elif difference > minimum and left_candidates[j] != left_candidates[0]:
-                    if left_candidates[j-1] not in total_votes:
-                        total_votes[left_candidates[j - 1]] = 0
-                    total_votes[left_candidates[j - 1]] += 1
-                    break
-                elif difference > minimum and left_candidates[j] == left_candidates[0]:
-                    if left_candidates[j] not in total_votes:
-                        total_votes[left_candidates[j]] = 0
-                    total_votes[left_candidates[j]] += 1
-                    break
-        if left_voters[i] > median_left_candidates:
-            minimum = left_voters[i] - left_candidates[len(left_candidates) - 1]
-            for j in reversed(range(len(left_candidates))):
-                difference = abs(left_voters[i] - left_candidates[j])
-                if difference < minimum:
-                    minimum = difference
-                elif difference > minimum and left_candidates[j] != left_candidates[len(left_candidates) - 1]:
-                    if left_candidates[j+1] not in total_votes:
-                        total_votes[left_candidates[j + 1]] = 0
-                    total_votes[left_candidates[j+1]] += 1
-                    break
-                elif difference > minimum and left_candidates[j] == left_candidates[len(left_candidates) - 1]:
-                    if left_candidates[j] not in total_votes:
-                        total_votes[left_candidates[j]] = 0
-                    total_votes[left_candidates[j]] += 1
-                    break
-    winner_one = max(total_votes, key=total_votes.get)
-    all_winners = []
-    for key in total_votes.keys():
-        if total_votes[key] == total_votes[winner_one]:
-            all_winners.append(key)
-    print("The Left Party Winner(s) is " + str(all_winners))
+        report("left_primary", RESULTS, "The left primary winner is ", left_candidates.tolist(),
+               winners=left_candidates.tolist())
+        return left_candidates.tolist()
+
+    left_voters = all_voters[:np.searchsorted(all_voters, median_voters, side='right')]
+    total_votes, winners = plurality_tally(left_voters, left_candidates)
+    all_winners = left_candidates[winners].tolist()
+    report("left_primary", RESULTS, "The Left Party Winner(s) is ", all_winners, winners=all_winners,
+           tally=total_votes)
     return all_winners
 
 """
  This function generates the winner in the right party in a primary system. It returns a list of
- all the winners. It takes in a list of all voters, the median voter, a list of all candidates, and the
- median candidate.
+ all the winners. It takes in a list of all voters (sorted), the median voter, a list of all candidates (sorted), and
+ the median candidate.
 """
 def generate_winners_right(all_voters, median_voters, all_candidates, median_candidates):
-    # Check to make sure there is a right primary
-    counter = 0
-
-    for i in range(len(all_candidates)):
-        if all_candidates[i] < median_voters:
-            counter += 1
+    all_voters = np.asarray(all_voters, dtype=float)
+    all_candidates = np.asarray(all_candidates, dtype=float)
+    right_candidates = all_candidates[all_candidates > median_voters]
 
-    if counter == len(all_candidates):
-        print("There is no right primary")
+    # Check to make sure there is a right primary
+    if len(right_candidates) == 0:
+        report("right_primary", RESULTS, "There is no right primary", winners=[])
         return []
 
-    right_voters = []
-    for i in range(len(all_voters)):
-        if all_voters[i] > median_voters:
-            right_voters.append(all_voters[i])
-    total_votes = {}
-    right_candidates = []
-    for i in range(len(all_candidates)):
-        if all_candidates[i] > median_voters:
-            right_candidates.append(all_candidates[i])
-
     if len(right_candidates) == 1:
-        print("The right primary winner is " + str(right_candidates))
-        return right_candidates
-
-    median_right_candidates = statistics.median(right_candidates)
-
-    for i in range(len(right_voters)):
-        if right_voters[i] <= median_right_candidates:
-            minimum = right_voters[i] - right_candidates[0]
-            for j in range(len(right_candidates)):
-                difference = abs(right_voters[i] - right_candidates[j])
-                if difference <= minimum:
-                    minimum = difference
-                elif difference > minimum and right_candidates[j] != right_candidates[0]:
-                    if right_candidates[j-1] not in total_votes:
-                        total_votes[right_candidates[j - 1]] = 0
-                    total_votes[right_candidates[j - 1]] += 1
-                    break
-                elif difference > minimum and right_candidates[j] == right_candidates[0]:
-                    if right_candidates[j] not in total_votes:
-                        total_votes[right_candidates[j]] = 0
-                    total_votes[right_candidates[j]] += 1
-                    break
-        if right_voters[i] > median_right_candidates:
-            minimum = right_voters[i] - right_candidates[len(right_candidates) - 1]
-            for j in reversed(range(len(right_candidates))):
-                difference = abs(right_voters[i] - right_candidates[j])
-                if difference < minimum:
-                    minimum = difference
-                elif difference > minimum and right_candidates[j] == right_candidates[len(right_candidates) - 1]:
-                    if right_candidates[j] not in total_votes:
-                        total_votes[right_candidates[j]] = 0
-                    total_votes[right_candidates[j]] += 1
-                    break
-                elif difference > minimum and right_candidates[j] != right_candidates[len(right_candidates) - 1]:
-                    if right_candidates[j+1] not in total_votes:
-                        total_votes[right_candidates[j + 1]] = 0
-                    total_votes[right_candidates[j+1]] += 1
-                    break
-    winner_one = max(total_votes, key=total_votes.get)
-    all_winners = []
-    for key in total_votes.keys():
-        if total_votes[key] == total_votes[winner_one]:
-            all_winners.append(key)
-    print("The Right Party Winner(s) is " + str(all_winners))
+        report("right_primary", RESULTS, "The right primary winner is ", right_candidates.tolist(),
+               winners=right_candidates.tolist())
+        return right_candidates.tolist()
+
+    right_voters = all_voters[np.searchsorted(all_voters, median_voters, side='right'):]
+    total_votes, winners = plurality_tally(right_voters, right_candidates)
+    all_winners = right_candidates[winners].tolist()
+    report("right_primary", RESULTS, "The Right Party Winner(s) is ", all_winners, winners=all_winners,
+           tally=total_votes)
     return all_winners
 
 """
-This function takes inputs of the left winner, right winner, and all the voters, and return the ultimate winner and
-polarization level in a  normal, first-past-the-post system. It prints the vote breakdown, ultimate winner, and 
-polarization
+This function takes inputs of the left winner, right winner, and all the voters (sorted), and return the ultimate
+winner and polarization level in a  normal, first-past-the-post system as a CESResult. It reports the vote breakdown,
+ultimate winner, and polarization
 """
 def ultimate_winner(left_winner, right_winner, all_voters):
-    both_winners = [];
-    total_votes = {}
-    median_voter = statistics.median(all_voters)
+    median_voter = np.median(all_voters)
 
     """ Account for case where there is no left/right primary and there is an uncontested general """
     if not left_winner:
-        print("All votes go to the right party-primary winner")
-        print("The ultimate winner is "+ str(right_winner))
         polarization = abs(median_voter - right_winner[0])
-        print("The polarization level for this election is " + str(polarization))
-        return right_winner, polarization
+        report("general", RESULTS, "All votes go to the right party-primary winner\nThe ultimate winner is ",
+               right_winner, "\nThe polarization level for this election is ", polarization,
+               winners=right_winner, polarization=polarization)
+        return CESResult(right_winner, polarization, {right_winner[0]: len(all_voters)})
 
     if not right_winner:
-        print("All votes go to the left party-primary winner")
-        print("The ultimate winner is " + str(left_winner))
         polarization = abs(median_voter - left_winner[0])
-        print("The polarization level for this election is " + str(polarization))
-        return left_winner, polarization
-
-    for winner in left_winner:
-        both_winners.append(winner)
-    for winner in right_winner:
-        both_winners.append(winner)
-    median_candidates = statistics.median(both_winners)
-
-    for i in range(len(all_voters)):
-        if all_voters[i] <= median_candidates:
-            minimum = all_voters[i] - both_winners[0]
-            for j in range(len(both_winners)):
-                difference = abs(all_voters[i] - both_winners[j])
-                if difference <= minimum:
-                    minimum = difference
-                elif difference > minimum and both_winners[j] == both_winners[0]:
-                    if both_winners[j] not in total_votes:
-                        total_votes[both_winners[j]] = 0
-                    total_votes[both_winners[j]] += 1
-                    break
-                elif difference > minimum and both_winners[j] != both_winners[0]:
-                    if both_winners[j - 1] not in total_votes:
-                        total_votes[both_winners[j - 1]] = 0
-                    total_votes[both_winners[j - 1]] += 1
-                    break
-        if all_voters[i] > median_candidates:
-            minimum = all_voters[i] - both_winners[len(both_winners) - 1]
-            for j in reversed(range(len(both_winners))):
-                difference = abs(all_voters[i] - both_winners[j])
-                if difference < minimum:
-                    minimum = difference
-                elif difference > minimum and both_winners[j] != both_winners[len(both_winners) - 1]:
-                    if both_winners[j + 1] not in total_votes:
-                        total_votes[both_winners[j + 1]] = 0
-                    total_votes[both_winners[j + 1]] += 1
-                    break
-                elif difference > minimum and both_winners[j] == both_winners[len(both_winners) - 1]:
-                    if both_winners[j] not in total_votes:
-                        total_votes[both_winners[j]] = 0
-                    total_votes[both_winners[j]] += 1
-                    break
-    print("The ultimate Vote Breakdown is " + str(total_votes))
+        report("general", RESULTS, "All votes go to the left party-primary winner\nThe ultimate winner is ",
+               left_winner, "\nThe polarization level for this election is ", polarization,
+               winners=left_winner, polarization=polarization)
+        return CESResult(left_winner, polarization, {left_winner[0]: len(all_voters)})
 
-    winner_one = max(total_votes, key=total_votes.get)
-    all_winners = []
-    for key in total_votes.keys():
-        if total_votes[key] == total_votes[winner_one]:
-            all_winners.append(key)
+    both_winners = np.sort(np.concatenate((left_winner, right_winner)))
+    total_votes, winners = plurality_tally(all_voters, both_winners)
+    breakdown = {float(both_winners[i]): int(total_votes[i]) for i in np.flatnonzero(total_votes)}
+    report("general_breakdown", BREAKDOWNS, "The ultimate Vote Breakdown is ", breakdown, tally=breakdown)
+
+    all_winners = both_winners[winners].tolist()
     if len(all_winners) > 1:
-        print("The result is a tie. The winners are " + str(all_winners))
-        polarization = abs(median_voter - statistics.mean(all_winners))
+        polarization = abs(median_voter - np.mean(all_winners))
+        report("general", RESULTS, "The result is a tie. The winners are ", all_winners,
+               winners=all_winners, polarization=polarization)
     else:
-        print("The ultimate winner is " + str(all_winners))
         polarization = abs(median_voter - all_winners[0])
-        print("The polarization level for this election is " + str(polarization))
+        report("general", RESULTS, "The ultimate winner is ", all_winners,
+               "\nThe polarization level for this election is ", polarization,
+               winners=all_winners, polarization=polarization)
 
-    return all_winners, polarization
+    return CESResult(all_winners, polarization, breakdown)
 
 """
 This function takes inputs of the number of candidates and number of voters in the election, and finds the winner
@@ -273,58 +227,13 @@ based on a random distribution of candidates and voters.
 This is a GENERAL example, and not directly run in main.
 """
 def generate_winners_normal(num_candidates, num_voters):
-    voters_original = []
-    candidates_original = []
-    for i in range(num_candidates):
-        candidates_original.append(random()*20)
-    for i in range(num_voters):
-        voters_original.append(random() * 20)
-    voters_sorted = sorted(voters_original)
-    candidates_sorted = sorted(candidates_original)
-    total_votes = {}
-    median_voters = statistics.median(voters_sorted)
-    median_candidates = statistics.median(candidates_sorted)
-
-    for i in range(len(voters_sorted)):
-        if voters_sorted[i] <= median_candidates:
-            minimum = voters_sorted[i] - candidates_sorted[0]
-            for j in range(len(candidates_sorted)):
-                difference = abs(voters_sorted[i] - candidates_sorted[j])
-                if difference <= minimum:
-                    minimum = difference
-                elif difference > minimum and candidates_sorted[j] != candidates_sorted[0]:
-                    if candidates_sorted[j-1] not in total_votes:
-                        total_votes[candidates_sorted[j - 1]] = 0
-                    total_votes[candidates_sorted[j - 1]] += 1
-                    break
-                elif difference > minimum and candidates_sorted[j] == candidates_sorted[0]:
-                    if candidates_sorted[j] not in total_votes:
-                        total_votes[candidates_sorted[j]] = 0
-                    total_votes[candidates_sorted[j]] += 1
-                    break
-        if voters_sorted[i] > median_candidates:
-            minimum = voters_sorted[i] - candidates_sorted[len(candidates_sorted) - 1]
-            for j in reversed(range(len(candidates_sorted))):
-                difference = abs(voters_sorted[i] - candidates_sorted[j])
-                if difference < minimum:
-                    minimum = difference
-                elif difference > minimum and candidates_sorted[j] != candidates_sorted[len(candidates_sorted) - 1]:
-                    if candidates_sorted[j+1] not in total_votes:
-                        total_votes[candidates_sorted[j + 1]] = 0
-                    total_votes[candidates_sorted[j+1]] += 1
-                    break
-                elif difference > minimum and candidates_sorted[j] == candidates_sorted[len(candidates_sorted) - 1]:
-                    if candidates_sorted[j] not in total_votes:
-                        total_votes[candidates_sorted[j]] = 0
-                    total_votes[candidates_sorted[j]] += 1
-                    break
-    print(total_votes)
-    winner_one = max(total_votes, key=total_votes.get)
-    all_winners = []
-    for key in total_votes.keys():
-        if total_votes[key] == total_votes[winner_one]:
-            all_winners.append(key)
-    print(all_winners)
+    voters_sorted, median_voters, candidates_sorted, median_candidates = \
+        generate_voters_candidates(num_voters, num_candidates)
+    total_votes, winners = plurality_tally(voters_sorted, candidates_sorted)
+    breakdown = {candidates_sorted[i]: int(total_votes[i]) for i in np.flatnonzero(total_votes)}
+    all_winners = [candidates_sorted[i] for i in winners]
+    report("plurality", RESULTS, breakdown, "\n", all_winners, winners=all_winners, tally=breakdown)
+    return all_winners
 
 """
 This is a helper that creates a sorted dictionary
@@ -349,28 +258,47 @@ def getList(dict):
 
     return list
 
+"""
+This function builds the ranked choice ballots of every voter at once. It returns a (voters x candidates) integer
+matrix whose row i lists the candidate indices in the order voter i ranks them, closest candidate first. Voters are
+handled chunk_size at a time so the distance matrix never grows past chunk_size x candidates.
+"""
+def create_rcv_ballots(all_voters_rcv, all_candidates_rcv, chunk_size=BALLOT_CHUNK_SIZE):
+    voters = np.asarray(all_voters_rcv, dtype=float)
+    candidates = np.asarray(all_candidates_rcv, dtype=float)
+    index_type = np.int16 if len(candidates) <= np.iinfo(np.int16).max else np.int32
+    ballots = np.empty((len(voters), len(candidates)), dtype=index_type)
+    for start in range(0, len(voters), chunk_size):
+        distances = np.abs(voters[start:start + chunk_size, None] - candidates[None, :])
+        ballots[start:start + chunk_size] = np.argsort(distances, axis=1, kind='stable')
+    return ballots
+
 """ 
 This function creates the votes for ranked choice voting as a list, taking in the voters and candidates.
+Each vote lists the candidate positions from most to least preferred.
 """
 def create_rcv_votes(all_voters_rcv, all_candidates_rcv):
-    ranked_votes = []
-    # have voters_sorted from generate voters function
-    for i in range(len(all_voters_rcv)):
-        candidate_distance = {}
-        for j in range(len(all_candidates_rcv)):
-            distance = abs(all_voters_rcv[i] - all_candidates_rcv[j])
-            candidate_distance[all_candidates_rcv[j]] = distance
-        #sorted_distances = sorted(candidate_distance.values())
-        # Need to create the same dictionary, sorted by values, and add the keys to a list
-        sorted_distances = create_sorted_dict(candidate_distance)
-        keys = getList(sorted_distances)
-        ranked_votes.append(keys)
-    return ranked_votes
-
-"""
-This function creates the winner for RCV, taking in the votes and the median voters
-"""
-def create_rcv_winner(ranked_votes, median_voters):
+    ballots = create_rcv_ballots(all_voters_rcv, all_candidates_rcv)
+    return np.asarray(all_candidates_rcv, dtype=float)[ballots].tolist()
+
+"""
+This is a helper that reports the winner of an RCV election.
+"""
+def report_rcv_winner(winner, polarization, first_choice_tally):
+    report("rcv_breakdown", BREAKDOWNS, "The first choice vote breakdown is ", first_choice_tally,
+           tally=first_choice_tally)
+    report("rcv", RESULTS, "The winning ranked choice candidate is ", winner, "\nThe polarization level is ",
+           polarization, winner=winner, polarization=polarization)
+
+"""
+This function creates the winner for RCV, taking in the votes and the median voters, and returns an RCVResult. The
+votes can either be the lists of candidate positions from create_rcv_votes, or the ballot matrix from
+create_rcv_ballots together with the candidates it indexes into.
+"""
+def create_rcv_winner(ranked_votes, median_voters, candidates=None):
+    if candidates is not None:
+        return create_rcv_winner_ballots(ranked_votes, median_voters, candidates)
+
     eliminated_candidates = []
     half_voters = len(ranked_votes) / 2
     while True:
@@ -385,14 +313,254 @@ def create_rcv_winner(ranked_votes, median_voters):
 
         for top_candidate in first_choice_tally:
             if first_choice_tally[top_candidate] > half_voters:
-                print("The first choice vote breakdown is " + str(first_choice_tally))
-                print("The winning ranked choice candidate is " + str(top_candidate))
                 polarization = abs(top_candidate - median_voters)
-                print("The polarization level is " + str(polarization))
-                return top_candidate, polarization
+                report_rcv_winner(top_candidate, polarization, first_choice_tally)
+                return RCVResult(top_candidate, polarization, eliminated_candidates, first_choice_tally)
         least_votes = min(first_choice_tally, key=first_choice_tally.get)
         eliminated_candidates.append(least_votes)
 
+"""
+This function creates the winner for RCV from a ballot matrix built by create_rcv_ballots. Each voter keeps a pointer
+to their highest-ranked surviving candidate, and only the voters of an eliminated candidate move their pointer on.
+As in the list version, only candidates who still hold first-choice votes can be eliminated, and ties for the fewest
+votes go to the leftmost candidate.
+"""
+def create_rcv_winner_ballots(ballots, median_voters, candidates):
+    candidates = np.asarray(candidates, dtype=float)
+    half_voters = len(ballots) / 2
+    active = np.ones(len(candidates), dtype=bool)
+    position = np.zeros(len(ballots), dtype=np.intp)
+    first_choice = ballots[:, 0].astype(np.intp)
+    eliminated = []
+    while True:
+        first_choice_tally = np.bincount(first_choice, minlength=len(candidates))
+        top_candidate = np.argmax(first_choice_tally)
+        if first_choice_tally[top_candidate] > half_voters:
+            breakdown = {float(candidates[i]): int(first_choice_tally[i]) for i in np.flatnonzero(first_choice_tally)}
+            polarization = abs(candidates[top_candidate] - median_voters)
+            winner = float(candidates[top_candidate])
+            report_rcv_winner(winner, polarization, breakdown)
+            return RCVResult(winner, polarization, candidates[eliminated].tolist(), breakdown)
+
+        least_votes = np.argmin(np.where(first_choice_tally > 0, first_choice_tally, np.inf))
+        eliminated.append(least_votes)
+        active[least_votes] = False
+        moved = np.flatnonzero(first_choice == least_votes)
+        while len(moved) > 0:
+            position[moved] += 1
+            first_choice[moved] = ballots[moved, position[moved]]
+            moved = moved[~active[first_choice[moved]]]
+
+"""
+This function creates the winner for RCV on a single left-right axis without building any ballots. It takes in the
+sorted voters, the sorted candidates, and the median voter. A candidate's first-choice votes are exactly the voters
+between the midpoints to its surviving neighbours, so each count is two binary searches over the sorted voters. The
+surviving candidates are kept in a doubly linked list, and when a candidate is eliminated only its two neighbours are
+recounted. The rules match create_rcv_winner: only candidates holding first-choice votes can be eliminated, and ties
+for the fewest votes go to the leftmost candidate.
+"""
+def create_rcv_winner_1d(voters_sorted, candidates_sorted, median_voters):
+    voters = np.asarray(voters_sorted, dtype=float)
+    candidates = np.asarray(candidates_sorted, dtype=float)
+    num_candidates = len(candidates)
+    half_voters = len(voters) / 2
+    previous = list(range(-1, num_candidates - 1))
+    following = list(range(1, num_candidates + 1))
+
+    first_choice_tally = plurality_tally(voters, candidates)[0].tolist()
+    least_votes_heap = [(votes, i) for i, votes in enumerate(first_choice_tally) if votes > 0]
+    heapq.heapify(least_votes_heap)
+    contenders = range(num_candidates)
+    eliminated = []
+
+    while True:
+        for top_candidate in contenders:
+            if first_choice_tally[top_candidate] > half_voters:
+                breakdown = {float(candidates[i]): first_choice_tally[i] for i in range(num_candidates)
+                             if first_choice_tally[i] > 0}
+                polarization = abs(candidates[top_candidate] - median_voters)
+                winner = float(candidates[top_candidate])
+                report_rcv_winner(winner, polarization, breakdown)
+                return RCVResult(winner, polarization, candidates[eliminated].tolist(), breakdown)
+
+        # Skip heap entries left behind by eliminated or recounted candidates
+        votes, least_votes = heapq.heappop(least_votes_heap)
+        while votes != first_choice_tally[least_votes]:
+            votes, least_votes = heapq.heappop(least_votes_heap)
+        first_choice_tally[least_votes] = 0
+        eliminated.append(least_votes)
+
+        left_neighbour = previous[least_votes]
+        right_neighbour = following[least_votes]
+        if left_neighbour >= 0:
+            following[left_neighbour] = right_neighbour
+        if right_neighbour < num_candidates:
+            previous[right_neighbour] = left_neighbour
+
+        contenders = [i for i in (left_neighbour, right_neighbour) if 0 <= i < num_candidates]
+        for i in contenders:
+            lower = 0
+            if previous[i] >= 0:
+                lower = np.searchsorted(voters, (candidates[previous[i]] + candidates[i]) / 2, side='right')
+            upper = len(voters)
+            if following[i] < num_candidates:
+                upper = np.searchsorted(voters, (candidates[i] + candidates[following[i]]) / 2, side='right')
+            first_choice_tally[i] = int(upper - lower)
+            if first_choice_tally[i] > 0:
+                heapq.heappush(least_votes_heap, (first_choice_tally[i], i))
+
+"""
+This helper runs a binary search in every row of a matrix at once. It takes in a (trials x voters) matrix whose rows
+are sorted and a (trials x queries) matrix, and returns how many voters in each row are <= each query of that row.
+Each row is shifted by its own offset so one np.searchsorted call over the flattened matrix does every search.
+Queries beyond the voters (including +/- inf) count as all or none of them.
+"""
+def count_voters_at_or_below(voters_sorted, queries):
+    num_trials, num_voters = voters_sorted.shape
+    lowest = voters_sorted[:, 0].min() - 1
+    highest = voters_sorted[:, -1].max() + 1
+    offsets = (highest - lowest + 1) * np.arange(num_trials)[:, None]
+    flat_voters = (voters_sorted + offsets).ravel()
+    flat_queries = np.clip(queries, lowest, highest) + offsets
+    return np.searchsorted(flat_voters, flat_queries, side='right') - num_voters * np.arange(num_trials)[:, None]
+
+"""
+This function finds the CES (primary, then general election) polarization of many elections at once. It takes in a
+(trials x voters) matrix and a (trials x candidates) matrix, both sorted along each row, and the median voter of each
+trial. Each candidate wins the party voters between the midpoints to its neighbours in the same party, and a tied
+general election is scored at the midpoint of the two finalists, as ultimate_winner does. The few trials with a tied
+primary, where ultimate_winner sends every tied candidate to the general election, are run through the scalar
+functions instead.
+"""
+def find_ces_polarization_batch(voters_sorted, candidates_sorted, median_voters):
+    num_trials, num_candidates = candidates_sorted.shape
+    rows = np.arange(num_trials)
+    median_column = median_voters[:, None]
+    is_left = candidates_sorted <= median_column
+    num_left = is_left.sum(axis=1)
+
+    midpoints = (candidates_sorted[:, :-1] + candidates_sorted[:, 1:]) / 2
+    same_party = is_left[:, :-1] == is_left[:, 1:]
+    upper = np.where(is_left, median_column, np.inf)
+    upper[:, :-1] = np.where(same_party, midpoints, upper[:, :-1])
+    lower = np.where(is_left, -np.inf, median_column)
+    lower[:, 1:] = np.where(same_party, midpoints, lower[:, 1:])
+    total_votes = count_voters_at_or_below(voters_sorted, upper) - count_voters_at_or_below(voters_sorted, lower)
+
+    left_tally = np.where(is_left, total_votes, -1)
+    right_tally = np.where(is_left, -1, total_votes)
+    left_winner = candidates_sorted[rows, np.argmax(left_tally, axis=1)]
+    right_winner = candidates_sorted[rows, np.argmax(right_tally, axis=1)]
+    tied_primary = ((is_left & (left_tally == left_tally.max(axis=1)[:, None])).sum(axis=1) > 1) | \
+        ((~is_left & (right_tally == right_tally.max(axis=1)[:, None])).sum(axis=1) > 1)
+
+    # General election between the two primary winners
+    general_midpoint = (left_winner + right_winner) / 2
+    left_votes = count_voters_at_or_below(voters_sorted, general_midpoint[:, None])[:, 0]
+    right_votes = voters_sorted.shape[1] - left_votes
+    winner = np.where(left_votes > right_votes, left_winner, right_winner)
+    winner = np.where(left_votes == right_votes, general_midpoint, winner)
+    winner = np.where(num_left == 0, right_winner, winner)
+    winner = np.where(num_left == num_candidates, left_winner, winner)
+    polarization = np.abs(median_voters - winner)
+
+    for i in np.flatnonzero(tied_primary):
+        left_winners = generate_winners_left(voters_sorted[i], median_voters[i], candidates_sorted[i], None)
+        right_winners = generate_winners_right(voters_sorted[i], median_voters[i], candidates_sorted[i], None)
+        polarization[i] = ultimate_winner(left_winners, right_winners, voters_sorted[i]).polarization
+    return polarization
+
+"""
+This function finds the RCV polarization of many elections at once, with the same rules as create_rcv_winner_1d. It
+takes in the sorted (trials x voters) and (trials x candidates) matrices and the median voter of each trial. Every
+round recounts all surviving candidates of the unfinished trials from the midpoints to their surviving neighbours and
+eliminates one candidate per trial.
+"""
+def find_rcv_polarization_batch(voters_sorted, candidates_sorted, median_voters):
+    num_trials, num_candidates = candidates_sorted.shape
+    half_voters = voters_sorted.shape[1] / 2
+    candidate_index = np.arange(num_candidates)
+    active = np.ones((num_trials, num_candidates), dtype=bool)
+    winner = np.zeros(num_trials)
+    open_trials = np.arange(num_trials)
+
+    while len(open_trials) > 0:
+        voters = voters_sorted[open_trials]
+        candidates = candidates_sorted[open_trials]
+        still_active = active[open_trials]
+        rows = np.arange(len(open_trials))[:, None]
+
+        # Nearest surviving neighbour on each side (-1 / num_candidates when there is none)
+        previous = np.maximum.accumulate(np.where(still_active, candidate_index, -1), axis=1)
+        previous = np.concatenate((np.full((len(open_trials), 1), -1), previous[:, :-1]), axis=1)
+        following = np.minimum.accumulate(np.where(still_active, candidate_index, num_candidates)[:, ::-1], axis=1)
+        following = np.concatenate((following[:, -2::-1], np.full((len(open_trials), 1), num_candidates)), axis=1)
+
+        lower = np.where(previous >= 0, (candidates[rows, np.maximum(previous, 0)] + candidates) / 2, -np.inf)
+        upper = np.where(following < num_candidates,
+                         (candidates + candidates[rows, np.minimum(following, num_candidates - 1)]) / 2, np.inf)
+        first_choice_tally = count_voters_at_or_below(voters, upper) - count_voters_at_or_below(voters, lower)
+        first_choice_tally = np.where(still_active, first_choice_tally, 0)
+
+        top_candidate = np.argmax(first_choice_tally, axis=1)
+        finished = first_choice_tally[rows[:, 0], top_candidate] > half_voters
+        winner[open_trials[finished]] = candidates[finished, top_candidate[finished]]
+
+        least_votes = np.argmin(np.where(first_choice_tally > 0, first_choice_tally, np.inf), axis=1)
+        continuing = open_trials[~finished]
+        active[continuing, least_votes[~finished]] = False
+        open_trials = continuing
+
+    return np.abs(median_voters - winner)
+
+"""
+This function runs num_run elections as array operations and returns the CES polarization, the RCV polarization, and
+the number of left candidates (at or below the median voter) of each election. The voters and candidates of a batch
+come from one call each to a NumPy Generator; rng can be a Generator or a seed. Trials are processed
+BATCH_VOTER_ENTRIES // num_voters at a time to bound memory. If num_left_candidates is given, every election is drawn
+with exactly that many left candidates by generate_voters_left and generate_candidates_left. With backend='numba' the
+RCV elections run on the compiled kernel of accelerated_kernels. With sampler='sobol' or 'halton' the candidates are
+placed with the points of that scrambled QMC sequence (see qmc_sampling) instead of rng's draws, while the voters are
+still drawn from rng.
+"""
+def simulate_elections_batch(num_voters, num_candidates, num_run, rng=None, num_left_candidates=None,
+                             backend='numpy', sampler='random'):
+    rng = np.random.default_rng(rng)
+    backend = resolve_backend(backend)
+    engine = make_qmc_engine(sampler, num_candidates, rng)
+    ces_polarization = np.empty(num_run)
+    rcv_polarization = np.empty(num_run)
+    num_left = np.empty(num_run, dtype=int)
+    batch_size = max(1, BATCH_VOTER_ENTRIES // num_voters)
+
+    for start in range(0, num_run, batch_size):
+        trials = min(batch_size, num_run - start)
+        if num_left_candidates is None:
+            voters = np.sort(rng.random((trials, num_voters)) * 20, axis=1)
+            median_voters = np.median(voters, axis=1)
+        else:
+            voters, median_voters = generate_voters_left(num_voters, num_candidates, num_left_candidates, trials, rng)
+        draws = draw_points(engine, trials) if engine is not None else None
+        if num_left_candidates is None:
+            if draws is None:
+                draws = rng.random((trials, num_candidates))
+            candidates = np.sort(draws * 20, axis=1)
+        else:
+            candidates = generate_candidates_left(median_voters, num_candidates, num_left_candidates, rng, draws)
+
+        ces_polarization[start:start + trials] = find_ces_polarization_batch(voters, candidates, median_voters)
+        if backend == 'numba':
+            rcv_polarization[start:start + trials] = rcv_polarization_batch(voters, candidates, median_voters)
+        else:
+            rcv_polarization[start:start + trials] = find_rcv_polarization_batch(voters, candidates, median_voters)
+        num_left[start:start + trials] = (candidates <= median_voters[:, None]).sum(axis=1)
+
+    return ces_polarization, rcv_polarization, num_left
+
+""" This function runs one shard of simulate_elections_batch for run_sharded, on the given backend and sampler. """
+def simulate_elections_shard(num_voters, num_candidates, backend, sampler, num_run, rng):
+    return simulate_elections_batch(num_voters, num_candidates, num_run, rng, backend=backend, sampler=sampler)
+
 """
 This function combines the other functions to print the candidates, the winners in the primary system,
 and the winners in the RCV system.
@@ -408,26 +576,28 @@ def all_functions(num_voters, num_candidates):
     ultimate_winner(left_winner, right_winner, result[0])
     print("")
     print("In a ranked choice, voting system:")
-    voter_choices = create_rcv_votes(result[0], result[2])
-    create_rcv_winner(voter_choices, result[1])
+    create_rcv_winner_1d(result[0], result[2], result[1])
 
 """
-This function graphs the results of extremism in a scatterplot.
+This function graphs the results of extremism in a scatterplot. With batch=True every election is simulated at once by
+simulate_elections_batch.
 """
-def graph_results(num_voters, num_candidates, num_run):
+def graph_results(num_voters, num_candidates, num_run, batch=False):
     x = []
     y = []
 
-    for i in range(num_run):
-        result = generate_voters_candidates(num_voters, num_candidates)
-        left_winner = generate_winners_left(result[0], result[1], result[2], result[3])
-        right_winner = generate_winners_right(result[0], result[1], result[2], result[3])
-        normal_result = ultimate_winner(left_winner, right_winner, result[0])
+    if batch:
+        x, y, num_left = simulate_elections_batch(num_voters, num_candidates, num_run)
+    else:
+        for i in range(num_run):
+            result = generate_voters_candidates(num_voters, num_candidates)
+            left_winner = generate_winners_left(result[0], result[1], result[2], result[3])
+            right_winner = generate_winners_right(result[0], result[1], result[2], result[3])
+            normal_result = ultimate_winner(left_winner, right_winner, result[0])
 
-        voter_choices = create_rcv_votes(result[0], result[2])
-        rcv_result = create_rcv_winner(voter_choices, result[1])
-        x.append(normal_result[1])
-        y.append(rcv_result[1])
+            rcv_result = create_rcv_winner_1d(result[0], result[2], result[1])
+            x.append(normal_result[1])
+            y.append(rcv_result[1])
 
     plt.scatter(x, y,  color="purple")
     plt.xlabel('Normal Election Polarization')
@@ -449,8 +619,7 @@ def find_distributions_for_point(num_voters, num_candidates):
     ultimate_winner(left_winner, right_winner, result[0])
     print("")
     print("In a ranked choice, voting system:")
-    voter_choices = create_rcv_votes(result[0], result[2])
-    create_rcv_winner(voter_choices, result[1])
+    create_rcv_winner_1d(result[0], result[2], result[1])
 
     print("The voter distribution is " + str(result[0]))
 
@@ -464,18 +633,18 @@ def make_histogram_RCV(num_voters, num_candidates):
     normal_result = ultimate_winner(left_winner, right_winner, result[0])
     candidates = result[2]
 
-    voter_choices = create_rcv_votes(result[0], result[2])
-    rcv_result = create_rcv_winner(voter_choices, result[1])
+    voter_choices = create_rcv_ballots(result[0], result[2])
+    rcv_result = create_rcv_winner_1d(result[0], result[2], result[1])
 
     normal_polarization = normal_result[1]
     rcv_polarization = rcv_result[1]
 
+    # Count each distinct top-three ranking straight from the ballot matrix
+    top_three = np.round(np.asarray(candidates)[voter_choices[:, :3]], 2)
+    rankings, counts = np.unique(top_three, axis=0, return_counts=True)
     dict_graphing = {}
-    for vote in voter_choices:
-        new_vote = str(round(vote[0], 2)) + " " + str(round(vote[1], 2)) + " " + str(round(vote[2], 2))
-        if new_vote not in dict_graphing:
-            dict_graphing[new_vote] = 0
-        dict_graphing[new_vote] += 1
+    for ranking, count in zip(rankings, counts):
+        dict_graphing[" ".join(str(candidate) for candidate in ranking)] = count
 
     if rcv_polarization < normal_polarization:
         plt.bar(list(dict_graphing.keys()), dict_graphing.values(), color='g')
@@ -494,26 +663,25 @@ def make_histogram_RCV(num_voters, num_candidates):
 This function is similar to the function that generates a scatterplot of polarization levels, but more specific.
 You can input the # of voters, # candidates, # elections simulated, and # left candidates, and see the resulting graph.
 In other words, you can specify the distribution of candidates (how many left candidates, how many right candidates 
-there are) and see the result.
+there are) and see the result. Every one of the num_run elections is drawn with exactly num_left_candidates left
+candidates. With batch=True every election is simulated at once by simulate_elections_batch.
 """
-def graph_specific_polarization(num_voters, num_candidates, num_run, num_left_candidates):
+def graph_specific_polarization(num_voters, num_candidates, num_run, num_left_candidates, batch=False):
     x = []
     y = []
 
-    for i in range(num_run):
-        result = generate_voters_candidates(num_voters, num_candidates)
-        candidates = result[2]
-        left_candidates = []
-        for j in range(len(candidates)):
-            if candidates[j] <= result[1]:
-                left_candidates.append(candidates[j])
-        if len(left_candidates) == num_left_candidates:
+    if batch:
+        x, y, num_left = simulate_elections_batch(num_voters, num_candidates, num_run,
+                                                  num_left_candidates=num_left_candidates)
+    else:
+        rng = np.random.default_rng()
+        for i in range(num_run):
+            result = generate_voters_candidates_left(num_voters, num_candidates, num_left_candidates, rng)
             left_winner = generate_winners_left(result[0], result[1], result[2], result[3])
             right_winner = generate_winners_right(result[0], result[1], result[2], result[3])
             normal_result = ultimate_winner(left_winner, right_winner, result[0])
 
-            voter_choices = create_rcv_votes(result[0], result[2])
-            rcv_result = create_rcv_winner(voter_choices, result[1])
+            rcv_result = create_rcv_winner_1d(result[0], result[2], result[1])
             x.append(normal_result[1])
             y.append(rcv_result[1])
 
@@ -527,32 +695,75 @@ def graph_specific_polarization(num_voters, num_candidates, num_run, num_left_ca
 """
 This function reports the number of situations, given a number of times the program is run, that RCV
 polarization > normal polarization, that RCV polarization < normal polarization, and that RCV polarization = normal 
-polarization
-"""
-def report_percentages(num_voters, num_candidates, num_run):
+polarization. With batch=True every election is simulated at once by simulate_elections_batch, split into shards that
+run on the given number of worker processes; a given seed gives the same counts for any number of workers. backend
+picks the kernels of the batched RCV elections (see simulate_elections_batch). With batch=True and sampler='sobol'
+or 'halton', the candidates come from that QMC sequence, every shard is one of the given number of independent
+scrambles, and the share of each outcome is also printed with its standard error across scrambles.
+
+With a target_width, num_run is only a cap: elections are simulated as with batch=True in batches until the confidence
+intervals (by the given method, see adaptive_stopping) of the shares where RCV is no worse and where it is tied are
+both narrower than target_width, and the number of elections used is printed with the counts. The intervals assume
+independent elections, so adaptive stopping only works with sampler='random'.
+"""
+def report_percentages(num_voters, num_candidates, num_run, batch=False, workers=1, seed=None, backend='numpy',
+                       sampler='random', scrambles=QMC_SCRAMBLES, target_width=None, method='wilson'):
     percentages = {}
+    # Validated here, once, rather than in every worker
+    backend = resolve_backend(backend)
+
+    if target_width is not None:
+        if sampler != 'random':
+            raise ValueError("Adaptive stopping draws its batches with sampler='random'")
+
+        def run_batch(trials, batch_seed):
+            ces_polarization, rcv_polarization, num_left = run_sharded(
+                simulate_elections_shard, trials, args=(num_voters, num_candidates, backend, 'random'),
+                seed=batch_seed, workers=workers)
+            return (np.sum(rcv_polarization > ces_polarization), np.sum(rcv_polarization == ces_polarization),
+                    np.sum(rcv_polarization < ces_polarization))
+
+        estimate = run_until_precise(run_batch, target_width, max_trials=num_run, method=method, rng=seed)
+        for key, count in (("RCV > normal", estimate.num_above), ("RCV = normal", estimate.num_equal),
+                           ("RCV < normal", estimate.num_below)):
+            if count > 0:
+                percentages[key] = count
+        print("Used " + str(estimate.trials) + " elections; no worse: " + str(estimate.no_worse_interval)
+              + ", tied: " + str(estimate.tied_interval))
+    elif batch:
+        shard_size = scramble_size(num_run, scrambles) if sampler != 'random' else SHARD_SIZE
+        ces_polarization, rcv_polarization, num_left = run_sharded(
+            simulate_elections_shard, num_run, args=(num_voters, num_candidates, backend, sampler), seed=seed,
+            workers=workers, shard_size=shard_size)
+        for key, count in (("RCV > normal", np.sum(rcv_polarization > ces_polarization)),
+                           ("RCV = normal", np.sum(rcv_polarization == ces_polarization)),
+                           ("RCV < normal", np.sum(rcv_polarization < ces_polarization))):
+            if count > 0:
+                percentages[key] = int(count)
+        if sampler != 'random':
+            print("Shares and standard errors over " + str(scrambles) + " " + sampler + " scrambles: "
+                  + str(polarization_shares(ces_polarization, rcv_polarization, num_run, scrambles)))
+    else:
+        for i in range(num_run):
+            result = generate_voters_candidates(num_voters, num_candidates)
+            left_winner = generate_winners_left(result[0], result[1], result[2], result[3])
+            right_winner = generate_winners_right(result[0], result[1], result[2], result[3])
+            normal_result = ultimate_winner(left_winner, right_winner, result[0])
 
-    for i in range(num_run):
-        result = generate_voters_candidates(num_voters, num_candidates)
-        left_winner = generate_winners_left(result[0], result[1], result[2], result[3])
-        right_winner = generate_winners_right(result[0], result[1], result[2], result[3])
-        normal_result = ultimate_winner(left_winner, right_winner, result[0])
-
-        voter_choices = create_rcv_votes(result[0], result[2])
-        rcv_result = create_rcv_winner(voter_choices, result[1])
-
-        if rcv_result[1] > normal_result[1]:
-            if "RCV > normal" not in percentages:
-                percentages["RCV > normal"] = 0
-            percentages["RCV > normal"] += 1
-        elif rcv_result[1] == normal_result[1]:
-            if "RCV = normal" not in percentages:
-                percentages["RCV = normal"] = 0
-            percentages["RCV = normal"] += 1
-        else:
-            if "RCV < normal" not in percentages:
-                percentages["RCV < normal"] = 0
-            percentages["RCV < normal"] += 1
+            rcv_result = create_rcv_winner_1d(result[0], result[2], result[1])
+
+            if rcv_result[1] > normal_result[1]:
+                if "RCV > normal" not in percentages:
+                    percentages["RCV > normal"] = 0
+                percentages["RCV > normal"] += 1
+            elif rcv_result[1] == normal_result[1]:
+                if "RCV = normal" not in percentages:
+                    percentages["RCV = normal"] = 0
+                percentages["RCV = normal"] += 1
+            else:
+                if "RCV < normal" not in percentages:
+                    percentages["RCV < normal"] = 0
+                percentages["RCV < normal"] += 1
 
     print(percentages)
 
@@ -567,8 +778,7 @@ def find_voters_candidates_for_RCV_greater(num_voters, num_candidates):
     left_winner = generate_winners_left(result[0], result[1], result[2], result[3])
     right_winner = generate_winners_right(result[0], result[1], result[2], result[3])
     normal_result = ultimate_winner(left_winner, right_winner, result[0])
-    voter_choices = create_rcv_votes(result[0], result[2])
-    rcv_result = create_rcv_winner(voter_choices, result[1])
+    rcv_result = create_rcv_winner_1d(result[0], result[2], result[1])
 
     num_election_winners = len(normal_result[0])
 
@@ -585,6 +795,8 @@ def find_voters_candidates_for_RCV_greater(num_voters, num_candidates):
 
 def main():
     args = sys.argv[1:]
+    if str(args[0]) in ("once", "identify", "voters-specific"):
+        set_verbosity(BREAKDOWNS)
     if str(args[0]) == "once":
         """Run one election, where the first input is the number of voters, the second is the number of candidates"""
         all_functions(int(args[1]), int(args[2]))
@@ -605,6 +817,19 @@ def main():
         """Print the percentage of times where RCV generates higher extremism than CES. The first input is the number
         of voters, the second is the number of candidates, and the third is the number of elections run."""
         report_percentages(int(args[1]), int(args[2]), int(args[3]))
+    elif str(args[0]) == "percentages-batch":
+        """Same as percentages, but every election is simulated at once as array operations. An optional fourth input
+        is the number of worker processes to use, and an optional fifth the sampler of the candidates (random, sobol
+        or halton)"""
+        workers = int(args[4]) if len(args) > 4 else 1
+        sampler = str(args[5]) if len(args) > 5 else 'random'
+        report_percentages(int(args[1]), int(args[2]), int(args[3]), batch=True, workers=workers, sampler=sampler)
+    elif str(args[0]) == "percentages-adaptive":
+        """Same as percentages-batch, but elections run in batches until the 95% confidence intervals of the shares
+        where RCV is no worse and where it is tied are narrower than a target width. The third input is the most
+        elections to run, the fourth is the target width, and an optional fifth is the number of worker processes"""
+        workers = int(args[5]) if len(args) > 5 else 1
+        report_percentages(int(args[1]), int(args[2]), int(args[3]), workers=workers, target_width=float(args[4]))
     elif str(args[0]) == "voters-specific":
         """Print the voter and candidate distribution in the case where RCV generates higher extremism than CES.
         The first input is the number of voters, the second is the number of candidates."""
@@ -612,7 +837,10 @@ def main():
     elif str(args[0]) == "scatterplot":
         """Graph a scatter plot documenting the extremism of the winning candidate in RCV vs CES, where the first input
         is the number of voters, the second is the number of candidates, and the third is the number of elections run"""
-        graph_results(int(args[0]), int(args[1]), int(args[2]))
+        graph_results(int(args[1]), int(args[2]), int(args[3]))
+    elif str(args[0]) == "scatterplot-batch":
+        """Same as scatterplot, but every election is simulated at once as array operations"""
+        graph_results(int(args[1]), int(args[2]), int(args[3]), batch=True)
     else:
         raise Exception("No option was selected")
 
@@ -0,0 +1,125 @@
+"""
+This file runs parameter sweeps: grids of independent simulation cells, such as one run per (mean, deviation,
+candidate count). A grid is given as its axes, each a name and the list of values it takes, and every combination of
+values is one cell.
+
+Cells are independent, so they run on a process pool, largest first by a cost model: starting the most expensive cells
+first keeps every worker busy until the end instead of leaving one grinding through a large cell while the rest sit
+idle. Every cell draws from its own generator, spawned from the sweep's seed by the cell's position in the grid, so a
+sweep gives the same results in any order and on any number of workers. Finished cells are reported as they come in
+and, with a checkpoint path, saved so a resumed sweep only runs the ones that are missing. The results are returned
+together once every cell is in, as a LabelledArray, so callers render only complete grids.
+"""
+
+import itertools
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from tqdm import tqdm
+
+import accelerated_kernels
+from checkpoints import save_checkpoint, load_matching_checkpoint
+from parallel_runs import describe
+
+"""
+The results of a sweep: names are the axis names, labels the values of each axis, and values an object array with one
+axis per grid axis holding every cell's result. values[i, j, ...] is the cell at labels[0][i], labels[1][j], ...
+"""
+LabelledArray = namedtuple('LabelledArray', ['names', 'labels', 'values'])
+
+""" This function returns the result at the given axis values, e.g. select(result, loc=0.5, numCandidates=4). """
+def select(result, **values):
+    index = tuple(list(labels).index(values[name]) for name, labels in zip(result.names, result.labels))
+    return result.values[index]
+
+"""
+This function turns the axes of a grid (a list of (name, values) pairs) into its cells, as (key, parameters) pairs
+where key holds the cell's index along every axis and parameters maps every axis name to the cell's value.
+"""
+def grid_cells(axes):
+    names = [name for name, _ in axes]
+    return [(key, dict(zip(names, values)))
+            for key, values in zip(itertools.product(*(range(len(values)) for _, values in axes)),
+                                   itertools.product(*(values for _, values in axes)))]
+
+""" This function runs one cell in a worker and returns its result with the seconds it took. """
+def run_cell(cell_function, args, parameters, seed_sequence):
+    start = time.perf_counter()
+    result = cell_function(*args, parameters, seed_sequence)
+    return result, time.perf_counter() - start
+
+"""
+This function runs every cell of the grid given by axes and returns a LabelledArray of their results. cell_function is
+called as cell_function(*args, parameters, seed_sequence), with the cell's parameters as a dict and a
+np.random.SeedSequence for it to draw from, and must be defined at the top level of a module so the workers can import
+it. Cells are started in order of decreasing cost(parameters) (all equal by default) on workers processes (all CPUs
+when workers is None), and a progress bar reports each one as it finishes.
+
+If checkpoint_path is given, the results of the cells finished so far are saved there after every cell, and a later
+call with the same arguments and resume=True only runs the cells that are missing. Results kept elsewhere (such as in
+a results_store.ResultsStore) can be plugged in too: cells for which lookup(parameters) returns a result are not run,
+and on_result(parameters, result) is called in this process for every cell that is.
+
+shared holds arguments that are passed to cell_function ahead of args but do not change any cell's result, such as the
+handles of arrays published to the workers with shared_arrays. They are left out of the checkpoint's configuration, so
+a resumed sweep can hand its cells differently published copies of the same data.
+"""
+def run_sweep(cell_function, axes, args=(), cost=None, workers=None, seed=None, checkpoint_path=None, resume=False,
+              show_progress=True, lookup=None, on_result=None, shared=()):
+    axes = [(name, list(values)) for name, values in axes]
+    cells = grid_cells(axes)
+    configuration = (describe(cell_function), describe(args), describe(axes), seed)
+    args = tuple(shared) + tuple(args)
+    state = load_matching_checkpoint(checkpoint_path, configuration) if resume else None
+    if state is None:
+        state = {'configuration': configuration, 'entropy': np.random.SeedSequence(seed).entropy, 'cells': {}}
+    results = state['cells']
+    if lookup is not None:
+        for key, parameters in cells:
+            if key not in results:
+                result = lookup(parameters)
+                if result is not None:
+                    results[key] = result
+
+    remaining = [(key, parameters) for key, parameters in cells if key not in results]
+    if cost is not None:
+        remaining.sort(key=lambda cell: cost(cell[1]), reverse=True)
+    if workers is None:
+        workers = os.cpu_count()
+
+    progress = tqdm(initial=len(cells) - len(remaining), total=len(cells), disable=not show_progress)
+
+    def finish_cell(key, parameters, result, seconds):
+        results[key] = result
+        if on_result is not None:
+            on_result(parameters, result)
+        if checkpoint_path is not None:
+            save_checkpoint(checkpoint_path, state)
+        progress.set_postfix_str(', '.join(f'{name}={value}' for name, value in parameters.items())
+                                 + f' in {seconds:.1f}s')
+        progress.update()
+
+    def seed_sequence(key):
+        return np.random.SeedSequence(state['entropy'], spawn_key=key)
+
+    if workers == 1 or len(remaining) <= 1:
+        for key, parameters in remaining:
+            finish_cell(key, parameters, *run_cell(cell_function, args, parameters, seed_sequence(key)))
+    elif len(remaining) > 0:
+        with ProcessPoolExecutor(max_workers=min(workers, len(remaining)),
+                                 mp_context=accelerated_kernels.pool_context(),
+                                 initializer=accelerated_kernels.init_pool_worker,
+                                 initargs=(accelerated_kernels.VALIDATED,)) as pool:
+            futures = {pool.submit(run_cell, cell_function, args, parameters, seed_sequence(key)): (key, parameters)
+                       for key, parameters in remaining}
+            for future in as_completed(futures):
+                finish_cell(*futures[future], *future.result())
+    progress.close()
+
+    values = np.empty(tuple(len(values) for _, values in axes), dtype=object)
+    for key, _ in cells:
+        values[key] = results[key]
+    return LabelledArray([name for name, _ in axes], [values for _, values in axes], values)
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from analytic_distributions import SplineCDF
+from general_distributions import getPrefixSum, randomSplineDistribution, randomBSplineDistribution
+
+
+# Some of these seeds draw splines that dip below zero between their knots
+@pytest.mark.parametrize('seed', range(200))
+def test_random_spline_cdf_is_monotone(seed):
+    distribution = SplineCDF(randomSplineDistribution(np.random.default_rng(seed)))
+    assert np.all(np.diff(distribution.cdf(np.linspace(0, 1, 20001))) >= -1e-12)
+    assert distribution.cdf(distribution.median) == pytest.approx(distribution.total / 2)
+
+
+# The analytic and grid engines model the same electorate
+@pytest.mark.parametrize('distributionToUse', [randomSplineDistribution, randomBSplineDistribution])
+@pytest.mark.parametrize('seed', range(10))
+def test_spline_cdf_matches_grid_prefix_sum(distributionToUse, seed):
+    graphSections = 200000
+    distribution = SplineCDF(distributionToUse(np.random.default_rng(seed)))
+    prefixSum, medianLoc = getPrefixSum(distributionToUse, graphSections, np.random.default_rng(seed), isNormal=False)
+    positions = np.linspace(0, 1, 11)
+    gridMass = prefixSum[np.round(positions * (graphSections - 1)).astype(int)] / prefixSum[-1]
+    np.testing.assert_allclose(distribution.cdf(positions) / distribution.total, gridMass, atol=1e-3)
+    assert distribution.median == pytest.approx(medianLoc / graphSections, abs=1e-3)
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from checkpoints import load_checkpoint, save_checkpoint
+from general_distributions import (runGeneralDistributionVoters, normalDistribution, randomNormalDistribution,
+                                   randomSplineDistribution, randomBSplineDistribution)
+from parallel_runs import run_sharded
+from result_sinks import ArraySink
+from standard_election import simulate_elections_shard
+
+
+class Interrupted(Exception):
+    pass
+
+
+# Stops the run before the third chunk is appended, so exactly two checkpoints have been written
+class InterruptingSink(ArraySink):
+
+    def __init__(self, capacity):
+        super().__init__(capacity)
+        self.appends = 0
+
+    def append(self, CESPolarization, RCVPolarization):
+        self.appends += 1
+        if self.appends == 3:
+            raise Interrupted()
+        super().append(CESPolarization, RCVPolarization)
+
+
+RUNS = {
+    'normal': dict(distributionToUse=normalDistribution),
+    'spline': dict(distributionToUse=randomSplineDistribution, isNormal=False),
+    'recreated spline': dict(distributionToUse=randomSplineDistribution, isNormal=False, recreateDistribution=True),
+    'recreated B-spline': dict(distributionToUse=randomBSplineDistribution, isNormal=False, recreateDistribution=True),
+    'analytic': dict(distributionToUse=randomNormalDistribution, isNormal=False, engine='analytic'),
+    'sobol': dict(distributionToUse=normalDistribution, sampler='sobol'),
+}
+
+
+@pytest.mark.parametrize('seed', [None, 3])
+@pytest.mark.parametrize('run', list(RUNS))
+def test_resumed_run_matches_uninterrupted_run(tmp_path, run, seed):
+    checkpointPath = str(tmp_path / 'run.pkl')
+    options = dict(trials=600, graphSections=20000, chunkSize=100, checkpointEvery=100, trialsPerRecreation=50,
+                   showProgress=False, **RUNS[run])
+
+    with pytest.raises(Interrupted):
+        runGeneralDistributionVoters(rng=seed, sink=InterruptingSink(600), checkpointPath=checkpointPath, **options)
+    checkpoint = load_checkpoint(checkpointPath)
+    assert checkpoint['trial'] == 200
+
+    # An unseeded run is compared against a full run from the generator state it started in
+    rng = np.random.default_rng()
+    rng.bit_generator.state = checkpoint['initialRng']
+    expected = runGeneralDistributionVoters(rng=seed if seed is not None else rng, **options)
+    resumed = runGeneralDistributionVoters(rng=seed, checkpointPath=checkpointPath, resume=True, **options)
+    for expectedPolarization, resumedPolarization in zip(expected, resumed):
+        np.testing.assert_array_equal(resumedPolarization, expectedPolarization)
+
+
+@pytest.mark.parametrize('seed', [None, 3])
+def test_resumed_sharded_run_matches_uninterrupted_run(tmp_path, seed):
+    checkpointPath = str(tmp_path / 'sharded.pkl')
+    arguments = dict(args=(51, 4, 'numpy', 'random'), seed=seed, workers=1, shard_size=100,
+                     checkpoint_path=checkpointPath)
+    expected = run_sharded(simulate_elections_shard, 500, **arguments)
+
+    # Forget all but the first two shards, as if the run had stopped there
+    checkpoint = load_checkpoint(checkpointPath)
+    checkpoint['completed'] = {0, 1}
+    save_checkpoint(checkpointPath, checkpoint)
+    resumed = run_sharded(simulate_elections_shard, 500, resume=True, **arguments)
+    for expectedResult, resumedResult in zip(expected, resumed):
+        np.testing.assert_array_equal(resumedResult, expectedResult)
@@ -0,0 +1,12 @@
+import numpy as np
+import pytest
+
+from general_distributions import getPrefixSum, randomSplineDistribution
+
+
+# Some of these seeds draw splines that dip below zero between their knots
+@pytest.mark.parametrize('seed', range(200))
+def test_random_spline_prefix_sum_is_monotone(seed):
+    prefixSum, medianLoc = getPrefixSum(randomSplineDistribution, 5000, np.random.default_rng(seed), isNormal=False)
+    assert np.all(np.diff(prefixSum) >= 0)
+    assert prefixSum[medianLoc] >= prefixSum[-1] / 2
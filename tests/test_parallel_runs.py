@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+import accelerated_kernels
+from general_distributions import runGeneralDistributionVoters, runGeneralDistributionVotersParallel
+from parallel_runs import run_sharded
+from standard_election import simulate_elections_batch, simulate_elections_shard
+
+
+@pytest.mark.parametrize('seed', [0, 12345])
+def test_sharded_elections_match_for_any_number_of_workers(seed):
+    arguments = dict(args=(51, 4, 'numpy', 'random'), seed=seed, shard_size=100)
+    serial = run_sharded(simulate_elections_shard, 450, workers=1, **arguments)
+    parallel = run_sharded(simulate_elections_shard, 450, workers=2, **arguments)
+    for serialResult, parallelResult in zip(serial, parallel):
+        np.testing.assert_array_equal(parallelResult, serialResult)
+
+
+def test_sharded_general_distribution_matches_for_any_number_of_workers():
+    arguments = dict(trials=400, shardSize=100, seed=7, graphSections=20000)
+    serial = runGeneralDistributionVotersParallel(workers=1, **arguments)
+    parallel = runGeneralDistributionVotersParallel(workers=2, **arguments)
+    for serialPolarization, parallelPolarization in zip(serial, parallel):
+        np.testing.assert_array_equal(parallelPolarization, serialPolarization)
+
+
+@pytest.mark.skipif(not accelerated_kernels.NUMBA_AVAILABLE, reason='Numba is not installed')
+def test_numba_backend_matches_numpy():
+    accelerated_kernels.validate_backend()
+    for backend_results in zip(simulate_elections_batch(101, 6, 500, rng=1, backend='numpy'),
+                               simulate_elections_batch(101, 6, 500, rng=1, backend='numba')):
+        np.testing.assert_array_equal(*backend_results)
+    for backend_results in zip(runGeneralDistributionVoters(trials=500, graphSections=20000, rng=2, showProgress=False),
+                               runGeneralDistributionVoters(trials=500, graphSections=20000, rng=2, showProgress=False,
+                                                            backend='numba')):
+        np.testing.assert_array_equal(*backend_results)
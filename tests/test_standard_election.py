@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from standard_election import (find_ces_polarization_batch, generate_winners_left, generate_winners_right,
+                               ultimate_winner)
+
+
+def scalar_ces_polarization(voters, candidates, median_voter):
+    left_winners = generate_winners_left(voters, median_voter, candidates, None)
+    right_winners = generate_winners_right(voters, median_voter, candidates, None)
+    return ultimate_winner(left_winners, right_winners, voters).polarization
+
+
+# Small electorates tie primaries often, which is where the batch and scalar rules used to disagree
+@pytest.mark.parametrize('num_voters, num_candidates', [(11, 3), (11, 5), (21, 4), (15, 7)])
+def test_ces_batch_matches_scalar_on_small_electorates(num_voters, num_candidates):
+    rng = np.random.default_rng(num_voters * 100 + num_candidates)
+    voters = np.sort(rng.random((5000, num_voters)) * 20, axis=1)
+    candidates = np.sort(rng.random((5000, num_candidates)) * 20, axis=1)
+    median_voters = np.median(voters, axis=1)
+
+    batch = find_ces_polarization_batch(voters, candidates, median_voters)
+    scalar = [scalar_ces_polarization(voters[i], candidates[i], median_voters[i]) for i in range(len(voters))]
+    np.testing.assert_allclose(batch, scalar, rtol=0, atol=1e-12)
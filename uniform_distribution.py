@@ -18,87 +18,197 @@ import sys
 import matplotlib.pyplot as plt
 import matplotlib.mlab as mlab
 from collections import Counter
+from parallel_runs import run_sharded
+from adaptive_stopping import run_until_precise
+from qmc_sampling import QMC_SCRAMBLES, make_qmc_engine, draw_points, scramble_size, polarization_shares
+from election_results import CESResult, RCVResult, RESULTS, BREAKDOWNS, report, set_verbosity
 
-""" This function generates a given number of candidates randomly. """
-def gen_candidates_uniform(num_candidates):
-    candidates_original = []
-    for i in range(num_candidates):
-        candidates_original.append(random() * 20)
+SAMPLE_BATCH_SIZE = 1000
+
+""" This function generates a given number of candidates randomly, drawing from rng (a np.random.Generator) if given. """
+def gen_candidates_uniform(num_candidates, rng=None):
+    if rng is not None:
+        candidates_original = (rng.random(num_candidates) * 20).tolist()
+    else:
+        candidates_original = []
+        for i in range(num_candidates):
+            candidates_original.append(random() * 20)
     candidates_sorted = sorted(candidates_original)
-    print("The candidates are " + str(candidates_sorted))
-    print("")
+    report("candidates", RESULTS, "The candidates are ", candidates_sorted, "\n", candidates=candidates_sorted)
     return candidates_sorted
 
-""" Given a list of candidates, this function recursively generates the RCV winner and polarization level. """
+"""
+This function generates num_run sets of candidates that each have exactly num_left_candidates candidates at or below
+10, the median voter. Conditioned on that count, uniformly drawn candidates are num_left_candidates uniform draws from
+0 to 10 and the rest uniform draws from above 10 to 20, so no draw is thrown away. It returns a (num_run x
+num_candidates) array of sorted candidates, drawn from rng (a np.random.Generator or a seed) if given.
+"""
+def gen_candidates_uniform_left(num_candidates, num_left_candidates, num_run, rng=None):
+    rng = np.random.default_rng(rng)
+    draws = rng.random((num_run, num_candidates)) * 10
+    is_left = np.arange(num_candidates) < num_left_candidates
+    return np.sort(np.where(is_left, draws, 20 - draws), axis=1)
+
+""" Given a list of candidates, this function generates the RCV winner and polarization level as an RCVResult,
+eliminating the candidate with the fewest votes each round. """
 def find_RCV_winner_uniform(candidates):
     candidates = sorted(candidates)
-    votes = {}
-    votes[candidates[0]] = candidates[0]/20
-    votes[candidates[len(candidates) - 1]] = (20 - candidates[len(candidates) - 1])/20
-    for i in range(len(candidates) - 1):
-        if candidates[i] not in votes:
-            votes[candidates[i]] = 0
-        if candidates[i+1] not in votes:
-            votes[candidates[i+1]] = 0
-        midpoint = (candidates[i] + candidates[i+1])/2
-        votes[candidates[i]] += ((midpoint - candidates[i])/20)
-        votes[candidates[i+1]] += ((candidates[i+1] - midpoint)/20)
-    winner = max(votes, key=votes.get)
-    if votes[winner] >= 0.5:
-        print("The final RCV vote breakdown is " + str(votes))
-        polarization = abs(10 - winner)
-        return winner, polarization
-    print("The initial RCV vote breakdown is " + str(votes))
-    least_votes = min(votes, key=votes.get)
-    candidates.remove(least_votes)
-    return find_RCV_winner_uniform(candidates)
-
-""" This function generates the RCV vote rankings. """
+    eliminated = []
+    while True:
+        votes = {}
+        votes[candidates[0]] = candidates[0]/20
+        votes[candidates[len(candidates) - 1]] = (20 - candidates[len(candidates) - 1])/20
+        for i in range(len(candidates) - 1):
+            if candidates[i] not in votes:
+                votes[candidates[i]] = 0
+            if candidates[i+1] not in votes:
+                votes[candidates[i+1]] = 0
+            midpoint = (candidates[i] + candidates[i+1])/2
+            votes[candidates[i]] += ((midpoint - candidates[i])/20)
+            votes[candidates[i+1]] += ((candidates[i+1] - midpoint)/20)
+        winner = max(votes, key=votes.get)
+        if votes[winner] >= 0.5:
+            report("rcv_breakdown", BREAKDOWNS, "The final RCV vote breakdown is ", votes, tally=votes)
+            polarization = abs(10 - winner)
+            return RCVResult(winner, polarization, eliminated, votes)
+        report("rcv_round", BREAKDOWNS, "The initial RCV vote breakdown is ", votes, tally=votes)
+        least_votes = min(votes, key=votes.get)
+        candidates.remove(least_votes)
+        eliminated.append(least_votes)
+
+"""
+This helper finds, in every row of a (trials x candidates) array of sorted candidates, each active candidate's share of
+the voters uniformly spread from lower to upper (arrays with one bound per row): the interval between the midpoints to
+its nearest active neighbours, or to the bounds where it has none. It also returns the order in which the dict-based
+engines above break ties, which try the leftmost and rightmost candidates first and then the others from left to right.
+"""
+def interval_shares_batch(candidates, active, lower, upper):
+    num_trials, num_candidates = candidates.shape
+    columns = np.arange(num_candidates)
+    rows = np.arange(num_trials)[:, None]
+    previous = np.maximum.accumulate(np.where(active, columns, -1), axis=1)
+    previous = np.concatenate((np.full((num_trials, 1), -1), previous[:, :-1]), axis=1)
+    following = np.minimum.accumulate(np.where(active, columns, num_candidates)[:, ::-1], axis=1)[:, ::-1]
+    following = np.concatenate((following[:, 1:], np.full((num_trials, 1), num_candidates)), axis=1)
+
+    left_bound = np.where(previous >= 0, (candidates[rows, np.maximum(previous, 0)] + candidates) / 2, lower[:, None])
+    right_bound = np.where(following < num_candidates,
+                           (candidates + candidates[rows, np.minimum(following, num_candidates - 1)]) / 2,
+                           upper[:, None])
+    shares = np.where(active, (right_bound - left_bound) / (upper - lower)[:, None], np.nan)
+    tie_order = np.where(previous < 0, -2, np.where(following == num_candidates, -1, columns))
+    return shares, tie_order
+
+""" This helper returns the column of the best active candidate in every row (the lowest share with lowest=True). """
+def pick_candidate_batch(shares, active, tie_order, lowest=False):
+    fill = np.inf if lowest else -np.inf
+    scores = np.where(active, shares, fill)
+    best = scores.min(axis=1, keepdims=True) if lowest else scores.max(axis=1, keepdims=True)
+    return np.argmin(np.where(active & (scores == best), tie_order, np.iinfo(np.int64).max), axis=1)
+
+"""
+This function finds the CES winner of many elections at once, with the same rules as find_normal_winner_uniform on
+voters spread uniformly from low to high: candidates below the midpoint of the interval run in the left primary and the
+rest in the right primary, and the left winner takes a tied general election. It takes in a (trials x candidates) array
+of sorted candidates and returns the column of each winner and its polarization.
+"""
+def find_normal_winners_uniform_batch(candidates, low=0, high=20):
+    candidates = np.asarray(candidates, dtype=float)
+    num_trials, num_candidates = candidates.shape
+    rows = np.arange(num_trials)
+    median = (low + high) / 2
+    is_left = candidates < median
+    low_bounds = np.full(num_trials, float(low))
+    median_bounds = np.full(num_trials, float(median))
+    high_bounds = np.full(num_trials, float(high))
+
+    shares, tie_order = interval_shares_batch(candidates, is_left, low_bounds, median_bounds)
+    left_winner = pick_candidate_batch(shares, is_left, tie_order)
+    shares, tie_order = interval_shares_batch(candidates, ~is_left, median_bounds, high_bounds)
+    right_winner = pick_candidate_batch(shares, ~is_left, tie_order)
+
+    # General election: the left winner gets the voters up to the midpoint between the two
+    midpoint = (candidates[rows, left_winner] + candidates[rows, right_winner]) / 2
+    winner = np.where(midpoint - low >= high - midpoint, left_winner, right_winner)
+    winner = np.where(is_left.any(axis=1), winner, right_winner)
+    winner = np.where(is_left.all(axis=1), left_winner, winner)
+    return winner, np.abs(median - candidates[rows, winner])
+
+"""
+This function finds the RCV winner of many elections at once, with the same rules as find_RCV_winner_uniform on voters
+spread uniformly from low to high: a candidate with at least half of the first choices wins, and otherwise the
+candidate with the fewest is eliminated. It takes in a (trials x candidates) array of sorted candidates and returns the
+column of each winner and its polarization.
+"""
+def find_RCV_winners_uniform_batch(candidates, low=0, high=20):
+    candidates = np.asarray(candidates, dtype=float)
+    num_trials, num_candidates = candidates.shape
+    active = np.ones((num_trials, num_candidates), dtype=bool)
+    winner = np.zeros(num_trials, dtype=int)
+    open_trials = np.arange(num_trials)
+
+    while len(open_trials) > 0:
+        still_active = active[open_trials]
+        shares, tie_order = interval_shares_batch(candidates[open_trials], still_active,
+                                                  np.full(len(open_trials), float(low)),
+                                                  np.full(len(open_trials), float(high)))
+        top_candidate = pick_candidate_batch(shares, still_active, tie_order)
+        finished = shares[np.arange(len(open_trials)), top_candidate] >= 0.5
+        winner[open_trials[finished]] = top_candidate[finished]
+
+        least_votes = pick_candidate_batch(shares, still_active, tie_order, lowest=True)
+        continuing = open_trials[~finished]
+        active[continuing, least_votes[~finished]] = False
+        open_trials = continuing
+
+    return winner, np.abs((low + high) / 2 - candidates[np.arange(num_trials), winner])
+
+"""
+This function enumerates the rankings voters spread uniformly from low to high give the candidates. Sweeping a voter
+from low to high, the ranking only changes at the midpoint of a pair of candidates, where the two (then adjacent in the
+ranking) swap places; the sweep visits the midpoints in order and swaps each pair in O(1) through an index of every
+candidate's place in the ranking. It returns a (regions x candidates) array of rankings, each a list of indices into
+candidates from first choice to last, and the share of the voters that holds each. candidates is left unmodified.
+"""
+def enumerate_rankings_uniform(candidates, low=0, high=20):
+    candidates = np.asarray(candidates, dtype=float)
+    first, second = np.triu_indices(len(candidates), 1)
+    midpoints = (candidates[first] + candidates[second]) / 2
+    order = np.argsort(midpoints, kind='stable')
+
+    ranking = np.argsort(np.abs(candidates - low), kind='stable')
+    place = np.empty(len(candidates), dtype=int)
+    place[ranking] = np.arange(len(candidates))
+    rankings = []
+    bounds = [low]
+    for mid, i, j in zip(midpoints[order].tolist(), first[order].tolist(), second[order].tolist()):
+        # Pairs with the same midpoint share no candidate, so they swap together at one boundary
+        if mid > bounds[-1]:
+            rankings.append(ranking.copy())
+            bounds.append(mid)
+        ranking[place[i]], ranking[place[j]] = j, i
+        place[i], place[j] = place[j], place[i]
+    rankings.append(ranking)
+    bounds.append(high)
+
+    return np.array(rankings).reshape(len(rankings), len(candidates)), np.diff(bounds) / (high - low)
+
+"""
+This function generates the RCV vote rankings: a dict from each ranking, written as the candidates rounded to two
+places from first choice to last, to the percentage of voters that hold it.
+"""
 def generate_voter_choices_uniform(candidates):
-    # generate dictionary, with key as all midpoints, value as tuple of the respective candidates it is between
-    midpoints = {}
-    for i in range(len(candidates)):
-        for j in range(i+1, len(candidates)):
-            midpoint = (candidates[i] + candidates[j])/2
-            if midpoint not in midpoints:
-                midpoints[midpoint] = []
-            t1 = (candidates[i], candidates[j])
-            midpoints[midpoint].append(t1)
-    midpoints = {key:value for key, value in sorted(midpoints.items(), key=lambda item: int(item[0]))}
-
-    candidate_copy = candidates
+    rankings, shares = enumerate_rankings_uniform(candidates)
+    names = [str(round(candidate, 2)) + " " for candidate in candidates]
     ultimate_votes = {}
-    last_midpoint = 0
-    for mid in midpoints: # iterate through keys, which are the midpoints
-        size = abs((mid - last_midpoint)*5) # turn area into percentages
-        # create key as a string with the candidate numbers rounded
-        new_vote = ""
-        for i in range(len(candidate_copy)):
-            new_vote += str(round(candidate_copy[i], 2)) + " "
-        ultimate_votes[new_vote] = size
-        list = midpoints[mid]
-        # swap as much as needed
-        for j in range(len(list)):
-            t1 = list[j]
-            candidate_one = t1[0]
-            candidate_two = t1[1]
-            idx_one = candidate_copy.index(candidate_one)
-            idx_two = candidate_copy.index(candidate_two)
-            candidate_copy[idx_one] = candidate_two
-            candidate_copy[idx_two] = candidate_one
-        last_midpoint = mid # recalculate pointer
-
-    size = abs((20 - last_midpoint)*5)
-    new_vote = ""
-    for i in range(len(candidate_copy)):
-        new_vote += str(round(candidate_copy[i], 2)) + " "
-    ultimate_votes[new_vote] = size
-
+    for ranking, share in zip(rankings.tolist(), shares.tolist()):
+        new_vote = "".join(names[i] for i in ranking)
+        ultimate_votes[new_vote] = ultimate_votes.get(new_vote, 0) + share * 100
     return ultimate_votes
 
 
-""" This function generates the CES system (primary, general election) winner and polarization level, given
-a list of candidates """
+""" This function generates the CES system (primary, general election) winner and polarization level as a CESResult,
+given a list of candidates """
 def find_normal_winner_uniform(candidates):
     candidates = sorted(candidates)
     left_candidates = []
@@ -110,24 +220,24 @@ def find_normal_winner_uniform(candidates):
             right_candidates.append(candidates[i])
 
     if len(left_candidates) == 0:
-        print("There is no left primary")
+        report("left_primary", RESULTS, "There is no left primary", winners=[])
         right_winner = find_right_winner_uniform(right_candidates)
         ultimate_winner = right_winner
         polarization = abs(10 - ultimate_winner)
-        return ultimate_winner, polarization
+        return CESResult(ultimate_winner, polarization, {ultimate_winner: 20})
     elif len(right_candidates) == 0:
-        print("There is no right primary")
+        report("right_primary", RESULTS, "There is no right primary", winners=[])
         left_winner = find_left_winner_uniform(left_candidates)
         ultimate_winner = left_winner
         polarization = abs(10 - ultimate_winner)
-        return ultimate_winner, polarization
+        return CESResult(ultimate_winner, polarization, {ultimate_winner: 20})
     elif len(left_candidates) == 1:
         left_winner = left_candidates[0]
-        print("The left winner is " + str(left_winner))
+        report("left_primary", RESULTS, "The left winner is ", left_winner, winners=[left_winner])
         right_winner = find_right_winner_uniform(right_candidates)
     elif len(right_candidates) == 1:
         right_winner = right_candidates[0]
-        print("The right winner is " + str(right_winner))
+        report("right_primary", RESULTS, "The right winner is ", right_winner, winners=[right_winner])
         left_winner = find_left_winner_uniform(left_candidates)
     else:
         left_winner = find_left_winner_uniform(left_candidates)
@@ -142,8 +252,9 @@ def find_normal_winner_uniform(candidates):
 
     ultimate_winner = max(votes,key=votes.get)
     polarization = abs(10 - ultimate_winner)
-    print("The ultimate winner in a normal election is " + str(ultimate_winner))
-    return ultimate_winner, polarization
+    report("general", RESULTS, "The ultimate winner in a normal election is ", ultimate_winner,
+           winners=[ultimate_winner], polarization=polarization, tally=votes)
+    return CESResult(ultimate_winner, polarization, votes)
 
 """
 This function generates the left primary winner.
@@ -162,7 +273,7 @@ def find_left_winner_uniform(left_candidates):
         votes[left_candidates[i + 1]] += ((left_candidates[i + 1] - midpoint) / 10)
 
     winner = max(votes, key=votes.get)
-    print("The left winner is " + str(winner))
+    report("left_primary", RESULTS, "The left winner is ", winner, winners=[winner], tally=votes)
     return winner
 
 """
@@ -182,7 +293,7 @@ def find_right_winner_uniform(right_candidates):
         votes[right_candidates[i + 1]] += ((right_candidates[i + 1] - midpoint) / 10)
 
     winner = max(votes, key=votes.get)
-    print("The right winner is " + str(winner))
+    report("right_primary", RESULTS, "The right winner is ", winner, winners=[winner], tally=votes)
     return winner
 
 """
@@ -200,19 +311,12 @@ def all_uniform_distribution(num_candidates):
 
 """
 This function graphs the polarization levels for RCV and normal, given a number of candidates
-and number of times the function is run. 
+and number of times the function is run. All the elections are run at once by the batched engines.
 """
 def graph_uniform_results(num_candidates, num_run):
-    x = []
-    y = []
-
-    for i in range(num_run):
-        candidates = gen_candidates_uniform(num_candidates)
-        normal_system = find_normal_winner_uniform(candidates)
-        RCV_system = find_RCV_winner_uniform(candidates)
-
-        x.append(normal_system[1])
-        y.append(RCV_system[1])
+    candidates = np.sort(np.random.default_rng().random((num_run, num_candidates)) * 20, axis=1)
+    x = find_normal_winners_uniform_batch(candidates)[1]
+    y = find_RCV_winners_uniform_batch(candidates)[1]
 
     plt.scatter(x, y, color="purple")
 
@@ -273,38 +377,21 @@ This function generates the histogram for how voters rank their choices in the s
 left candidates.
 """
 def make_hist_uniform_rcv_choose(num_candidates, num_left_candidates):
-    candidates = gen_candidates_uniform(num_candidates)
-    left_candidates = []
-    for candidate in candidates:
-        if candidate <= 10:
-            left_candidates.append(candidate)
-    if len(left_candidates) == num_left_candidates:
-        dict_graphing = generate_voter_choices_uniform(candidates)
+    candidates = gen_candidates_uniform_left(num_candidates, num_left_candidates, 1)[0].tolist()
+    dict_graphing = generate_voter_choices_uniform(candidates)
 
-        plt.bar(list(dict_graphing.keys()), dict_graphing.values(), color='g')
-        plt.title(str(num_left_candidates) + " left candidates")
-        plt.show()
-    else:
-        make_hist_uniform_rcv_choose(num_candidates, num_left_candidates)
+    plt.bar(list(dict_graphing.keys()), dict_graphing.values(), color='g')
+    plt.title(str(num_left_candidates) + " left candidates")
+    plt.show()
 
 """
-This function graphs the scenarios where you can choose the number of left candidates in a scatter plot.
+This function graphs the scenarios where you can choose the number of left candidates in a scatter plot. Every one of
+the num_run elections has exactly num_left_candidates left candidates.
 """
 def scatter_specific_uniform(num_candidates, num_run, num_left_candidates):
-    x = []
-    y = []
-
-    for i in range(num_run):
-        candidates = gen_candidates_uniform(num_candidates)
-        left_candidates = []
-        for j in range(len(candidates)):
-            if candidates[j] <= 10:
-                left_candidates.append(candidates[j])
-        if len(left_candidates) == num_left_candidates:
-            normal_system = find_normal_winner_uniform(candidates)
-            RCV_system = find_RCV_winner_uniform(candidates)
-            x.append(normal_system[1])
-            y.append(RCV_system[1])
+    candidates = gen_candidates_uniform_left(num_candidates, num_left_candidates, num_run)
+    x = find_normal_winners_uniform_batch(candidates)[1]
+    y = find_RCV_winners_uniform_batch(candidates)[1]
 
     plt.scatter(x, y, color="purple")
 
@@ -313,29 +400,30 @@ def scatter_specific_uniform(num_candidates, num_run, num_left_candidates):
     plt.title('RCV vs. First-Past-The-Post Primary Polarization')
     plt.show()
 
+"""
+This function prints the candidates, and graphs the ranking histogram, of an election with the chosen number of left
+candidates where RCV polarization > normal polarization. Candidate sets are drawn SAMPLE_BATCH_SIZE at a time until
+one qualifies.
+"""
 def print_candidates_RCV_greater_choose(num_candidates, num_left_candidates):
-    candidates = gen_candidates_uniform(num_candidates)
-    left_candidates = []
-    for candidate in candidates:
-        if candidate <= 10:
-            left_candidates.append(candidate)
-    if len(left_candidates) == num_left_candidates:
-        dict_graphing = generate_voter_choices_uniform(candidates)
-        normal_system = find_normal_winner_uniform(candidates)
-        RCV_system = find_RCV_winner_uniform(candidates)
-
-        normal_polarization = normal_system[1]
-        rcv_polarization = RCV_system[1]
-
-        if normal_polarization < rcv_polarization:
+    rng = np.random.default_rng()
+    while True:
+        batch = gen_candidates_uniform_left(num_candidates, num_left_candidates, SAMPLE_BATCH_SIZE, rng)
+        normal_polarization = find_normal_winners_uniform_batch(batch)[1]
+        rcv_polarization = find_RCV_winners_uniform_batch(batch)[1]
+        qualifying = np.flatnonzero(normal_polarization < rcv_polarization)
+
+        if len(qualifying) > 0:
+            candidates = batch[qualifying[0]].tolist()
+            # Rerun the chosen election on the scalar engines for its reported breakdowns
+            find_normal_winner_uniform(list(candidates))
+            find_RCV_winner_uniform(list(candidates))
+            dict_graphing = generate_voter_choices_uniform(candidates)
             print("The candidates in this election are " + str(candidates))
             plt.bar(list(dict_graphing.keys()), dict_graphing.values(), color='g')
             plt.title(str(num_left_candidates) + " left candidates")
             plt.show()
-        else:
-            print_candidates_RCV_greater_choose(num_candidates, num_left_candidates)
-    else:
-        print_candidates_RCV_greater_choose(num_candidates, num_left_candidates)
+            return
 
 """ This function is a helper to plot a line based on slope and intercept"""
 def abline(slope, intercept):
@@ -344,27 +432,15 @@ def abline(slope, intercept):
     y_vals = intercept + slope * x_vals
     plt.plot(x_vals, y_vals, '--')
 
-""" This function allows you to choose the winner of each election and compute the result. """
+""" This function allows you to choose the winner of each election and compute the result. Every one of the num_run
+elections has exactly num_left_candidates left candidates; only those with the chosen winners are plotted. """
 def choose_winners(num_candidates, num_run, num_left_candidates, winner_choice_CES, winner_choice_RCV):
-    x = []
-    y = []
-
-    for i in range(num_run):
-        candidates = gen_candidates_uniform(num_candidates)
-        left_candidates = []
-
-        for j in range(len(candidates)):
-            if candidates[j] <= 10:
-                left_candidates.append(candidates[j])
-        if len(left_candidates) == num_left_candidates:
-            CES_system = find_normal_winner_uniform(candidates)
-            RCV_system = find_RCV_winner_uniform(candidates)
-            CES_winner = CES_system[0]
-            RCV_winner = RCV_system[0]
-
-            if CES_winner == candidates[winner_choice_CES] and RCV_winner == candidates[winner_choice_RCV]:
-                x.append(CES_system[1])
-                y.append(RCV_system[1])
+    candidates = gen_candidates_uniform_left(num_candidates, num_left_candidates, num_run)
+    CES_winner, CES_polarization = find_normal_winners_uniform_batch(candidates)
+    RCV_winner, RCV_polarization = find_RCV_winners_uniform_batch(candidates)
+    chosen = (CES_winner == winner_choice_CES) & (RCV_winner == winner_choice_RCV)
+    x = CES_polarization[chosen]
+    y = RCV_polarization[chosen]
 
     plt.scatter(x, y, color="purple")
     plt.xlabel('Normal Election Polarization')
@@ -376,23 +452,80 @@ def choose_winners(num_candidates, num_run, num_left_candidates, winner_choice_C
               + 'CES winner, ' + str(winner_choice_RCV) + 'RCV_winner')
     plt.show()
 
-def calculate_percent_uniform(num_candidates, num_run):
-    RCV_winners = 0
-
-    for i in range(num_run):
-        candidates = gen_candidates_uniform(num_candidates)
-        CES_system = find_normal_winner_uniform(candidates)
-        RCV_system = find_RCV_winner_uniform(candidates)
-
-        CES_polarization = CES_system[1]
-        rcv_polarization = RCV_system[1]
+"""
+This function runs num_run elections with candidates drawn from rng and returns how many of them RCV polarization was
+greater than CES polarization. It is the shard function that calculate_percent_uniform runs across workers. The
+candidates are drawn as one (num_run x num_candidates) block, the same draws as num_run calls to gen_candidates_uniform.
+"""
+def count_RCV_worse_uniform(num_candidates, num_run, rng):
+    candidates = np.sort(rng.random((num_run, num_candidates)) * 20, axis=1)
+    CES_polarization = find_normal_winners_uniform_batch(candidates)[1]
+    rcv_polarization = find_RCV_winners_uniform_batch(candidates)[1]
+    return int(np.count_nonzero(rcv_polarization > CES_polarization))
 
-        if rcv_polarization > CES_polarization:
-            RCV_winners += 1
+"""
+This function runs num_run elections with candidates drawn from rng and returns how many of them had RCV polarization
+greater than, equal to, and less than CES polarization. It is the shard function of the adaptive mode of
+calculate_percent_uniform.
+"""
+def count_outcomes_uniform(num_candidates, num_run, rng):
+    candidates = np.sort(rng.random((num_run, num_candidates)) * 20, axis=1)
+    CES_polarization = find_normal_winners_uniform_batch(candidates)[1]
+    rcv_polarization = find_RCV_winners_uniform_batch(candidates)[1]
+    return (int(np.count_nonzero(rcv_polarization > CES_polarization)),
+            int(np.count_nonzero(rcv_polarization == CES_polarization)),
+            int(np.count_nonzero(rcv_polarization < CES_polarization)))
 
-    total_percent = RCV_winners/num_run
+"""
+This function runs num_run elections with candidates taken from a scrambled Sobol or Halton sequence (see qmc_sampling)
+scrambled from rng, and returns the CES and RCV polarization of each. It is the shard function of
+calculate_percent_uniform when it samples with QMC, where every shard is one scramble.
+"""
+def simulate_uniform_qmc(num_candidates, sampler, num_run, rng):
+    candidates = np.sort(draw_points(make_qmc_engine(sampler, num_candidates, rng), num_run) * 20, axis=1)
+    return find_normal_winners_uniform_batch(candidates)[1], find_RCV_winners_uniform_batch(candidates)[1]
 
-    print("The percent of times that RCV performs worse is " + str(total_percent) + "%")
+"""
+This function reports the share of elections where RCV polarization is greater than CES polarization. The elections
+are split into shards that run on the given number of worker processes; a given seed gives the same result for any
+number of workers. With sampler='sobol' or 'halton' the candidates come from that QMC sequence instead, split into
+the given number of independent scrambles, and the standard error across scrambles is reported with the share.
+
+With a target_width, num_run is only a cap: elections run in batches until the confidence intervals (by the given
+method, see adaptive_stopping) of the shares where RCV is no worse and where it is tied are both narrower than
+target_width, and the number of elections used is reported.
+"""
+def calculate_percent_uniform(num_candidates, num_run, workers=1, seed=None, sampler='random', scrambles=QMC_SCRAMBLES,
+                              target_width=None, method='wilson'):
+    if target_width is not None:
+        if sampler != 'random':
+            raise ValueError("Adaptive stopping draws its batches with sampler='random'")
+        estimate = run_until_precise(
+            lambda trials, batch_seed: run_sharded(count_outcomes_uniform, trials, args=(num_candidates,),
+                                                   seed=batch_seed, workers=workers),
+            target_width, max_trials=num_run, method=method, rng=seed)
+        total_percent = estimate.num_above / estimate.trials
+
+        print("The percent of times that RCV performs worse is " + str(total_percent) + "% after "
+              + str(estimate.trials) + " elections (no worse: " + str(estimate.no_worse_interval) + ", tied: "
+              + str(estimate.tied_interval) + ")")
+        return total_percent
+
+    if sampler == 'random':
+        RCV_winners = run_sharded(count_RCV_worse_uniform, num_run, args=(num_candidates,), seed=seed, workers=workers)
+
+        total_percent = RCV_winners/num_run
+
+        print("The percent of times that RCV performs worse is " + str(total_percent) + "%")
+        return total_percent
+
+    CES_polarization, RCV_polarization = run_sharded(simulate_uniform_qmc, num_run, args=(num_candidates, sampler),
+                                                     seed=seed, workers=workers,
+                                                     shard_size=scramble_size(num_run, scrambles))
+    total_percent, error = polarization_shares(CES_polarization, RCV_polarization, num_run, scrambles)["RCV > normal"]
+
+    print("The percent of times that RCV performs worse is " + str(total_percent) + "% (standard error "
+          + str(error) + " over " + str(scrambles) + " " + sampler + " scrambles)")
     return total_percent
 
 
@@ -400,6 +533,8 @@ def calculate_percent_uniform(num_candidates, num_run):
 def main():
     # First input is number of voters, second is number of candidates
     args = sys.argv[1:]
+    if str(args[0]) in ("uniform-once", "uniform-print-choose-greater"):
+        set_verbosity(BREAKDOWNS)
     if str(args[0]) == "uniform-once":
         """Run one election using a uniform distribution, where the first input is the number of candidates"""
         all_uniform_distribution(int(args[1]))
@@ -434,8 +569,18 @@ def main():
         choose_winners(int(args[1]), int(args[2]), int(args[3]), int(args[4]), int(args[5]))
     elif str(args[0]) == "percents":
         """Print the percentage of times where RCV generates higher extremism than CES, where the first input is the
-        number of candidates and the second is the number of elections"""
-        calculate_percent_uniform(int(args[1]), int(args[2]))
+        number of candidates, the second is the number of elections, the optional third is the number of worker
+        processes, and the optional fourth is the sampler of the candidates (random, sobol or halton)"""
+        workers = int(args[3]) if len(args) > 3 else 1
+        sampler = str(args[4]) if len(args) > 4 else 'random'
+        calculate_percent_uniform(int(args[1]), int(args[2]), workers=workers, sampler=sampler)
+    elif str(args[0]) == "percents-adaptive":
+        """Same as percents, but elections run in batches until the 95% confidence intervals of the shares where RCV is
+        no worse and where it is tied are narrower than a target width. The first input is the number of candidates,
+        the second is the most elections to run, the third is the target width, and the optional fourth is the number
+        of worker processes"""
+        workers = int(args[4]) if len(args) > 4 else 1
+        calculate_percent_uniform(int(args[1]), int(args[2]), workers=workers, target_width=float(args[3]))
     else:
         raise Exception("No option was selected")
 